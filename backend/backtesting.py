@@ -0,0 +1,161 @@
+"""Rolling-origin backtest of the forecasting pipeline for every product
+
+For each product and each monthly cutoff, the models are trained only on months
+before the cutoff and scored on the following `horizon` months, so no future data
+reaches training. (product, cutoff) windows are fanned out over a process pool and
+the errors are rolled up into MAE/RMSE/MAPE per method and horizon, one document
+per (product, method) plus a catalog-wide roll-up, in backtest_results.
+
+    python backtesting.py --horizon 6 --min-train 12 --step 1
+"""
+import argparse
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from forecasting import exponential_smoothing_forecast
+from ml_model import FEATURE_COLUMNS, MLModels, blend_forecasts, build_training_frame, product_features
+
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", os.cpu_count() or 1))
+# Key of the roll-up over every product in a run
+CATALOG_KEY = "__catalog__"
+
+def backtest_window(product, sales_data, cutoff, horizon, params=None):
+    """Train on rows before `cutoff` and forecast the next `horizon` rows
+
+    Returns {method: [(h, actual, predicted), ...]}; runs inside a worker process.
+    """
+    df = build_training_frame(product, sales_data)
+    history = df.iloc[:cutoff]
+    actual = df['units_sold'].iloc[cutoff:cutoff + horizon].to_numpy(dtype=float)
+    periods = len(actual)
+
+    time_series = exponential_smoothing_forecast(
+        history['units_sold'].to_numpy(dtype=float)[None, :], periods
+    )["forecast"][0]
+
+    trained = MLModels()
+    trained.train_regression_models(history, params)
+    features = [product_features(product)]
+    predictions = {
+        'time_series': time_series,
+        'xgboost': np.repeat(trained.predict_batch(features, 'xgboost'), periods),
+        'random_forest': np.repeat(trained.predict_batch(features, 'random_forest'), periods),
+    }
+    predictions['hybrid'] = blend_forecasts(predictions['xgboost'], time_series)
+
+    return {
+        method: [(h + 1, float(actual[h]), float(predicted[h])) for h in range(periods)]
+        for method, predicted in predictions.items()
+    }
+
+def error_metrics(errors):
+    """MAE/RMSE/MAPE per horizon from (h, actual, predicted) tuples"""
+    if not errors:
+        return []
+    errors = np.asarray(errors, dtype=float)
+    rows = []
+    for h in np.unique(errors[:, 0]).astype(int):
+        actual, predicted = errors[errors[:, 0] == h, 1], errors[errors[:, 0] == h, 2]
+        residual = actual - predicted
+        # Months with zero sales have no defined percentage error
+        nonzero = actual != 0
+        rows.append({
+            "horizon": int(h),
+            "mae": float(np.mean(np.abs(residual))),
+            "rmse": float(np.sqrt(np.mean(residual ** 2))),
+            "mape": float(np.mean(np.abs(residual[nonzero] / actual[nonzero])) * 100) if nonzero.any() else None,
+            "n": int(len(actual))
+        })
+    return rows
+
+def cutoffs(n_rows, min_train=12, step=1):
+    """Rolling origins: every `step` months once `min_train` months of history exist"""
+    return list(range(min_train, n_rows, step)) if n_rows > min_train else []
+
+def run_backtest(products, sales_by_model, horizon=6, min_train=12, step=1, executor=None, params_by_model=None):
+    """Backtest every product and return the result documents (without run metadata)
+
+    params_by_model holds each product's stored hyperparameters so the replay uses
+    the same settings as production.
+    """
+    params_by_model = params_by_model or {}
+    # Products missing specs cannot be trained; one of them must not sink the run
+    products = [product for product in products if all(product.get(f) is not None for f in FEATURE_COLUMNS)]
+    windows = [
+        (product, sales_by_model[product["model"]], cutoff)
+        for product in products
+        for cutoff in cutoffs(len(sales_by_model.get(product["model"], [])), min_train, step)
+    ]
+    args = (
+        [product for product, _, _ in windows],
+        [sales for _, sales, _ in windows],
+        [cutoff for _, _, cutoff in windows],
+        [horizon] * len(windows),
+        [params_by_model.get(product["model"]) for product, _, _ in windows]
+    )
+    if executor is None:
+        results = map(backtest_window, *args)
+    else:
+        results = executor.map(backtest_window, *args, chunksize=max(1, len(windows) // (8 * BACKTEST_WORKERS)))
+
+    errors = {}
+    for (product, _, _), result in zip(windows, results):
+        for method, rows in result.items():
+            errors.setdefault((product["model"], method), []).extend(rows)
+            errors.setdefault((CATALOG_KEY, method), []).extend(rows)
+
+    n_windows = {}
+    for product, _, _ in windows:
+        n_windows[product["model"]] = n_windows.get(product["model"], 0) + 1
+    n_windows[CATALOG_KEY] = len(windows)
+
+    return [
+        {"model": model, "method": method, "windows": n_windows[model], "horizons": error_metrics(rows)}
+        for (model, method), rows in errors.items()
+    ]
+
+def main():
+    from database import init_database, smartphones_collection, sales_collection, backtest_results_collection
+    from model_registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of every product's forecasts")
+    parser.add_argument("--horizon", type=int, default=6)
+    parser.add_argument("--min-train", type=int, default=12, help="months of history before the first cutoff")
+    parser.add_argument("--step", type=int, default=1, help="months between cutoffs")
+    parser.add_argument("--workers", type=int, default=BACKTEST_WORKERS)
+    parser.add_argument("--model", action="append", help="only backtest these products (repeatable)")
+    args = parser.parse_args()
+
+    init_database()
+    query = {"model": {"$in": args.model}} if args.model else {}
+    products = list(smartphones_collection.find(query, {"_id": 0}))
+    sales_by_model = {}
+    for row in sales_collection.find({"model": {"$in": [p["model"] for p in products]}}, {"_id": 0}):
+        sales_by_model.setdefault(row["model"], []).append(row)
+
+    registry = ModelRegistry()
+    params_by_model = {}
+    for product in products:
+        metadata = registry.metadata(product["model"])
+        if metadata and metadata.get("params"):
+            params_by_model[product["model"]] = metadata["params"]
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        documents = run_backtest(products, sales_by_model, args.horizon, args.min_train, args.step,
+                                 executor, params_by_model)
+
+    run = {"run_id": uuid.uuid4().hex, "created_at": datetime.now(), "horizon": args.horizon,
+           "min_train": args.min_train, "step": args.step}
+    if documents:
+        backtest_results_collection.insert_many([{**run, **document} for document in documents])
+    print(f"Backtested {len(products)} products in {time.perf_counter() - started:.1f}s; run {run['run_id']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import json
+from typing import List
+
+from pydantic import TypeAdapter, ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database import run_db
+from models import Product, SalesData
+
+PRODUCT_ADAPTER = TypeAdapter(List[Product])
+SALES_ADAPTER = TypeAdapter(List[SalesData])
+
+# Unique keys matching the indexes created in init_database
+PRODUCT_KEY = ("model",)
+SALES_KEY = ("model", "month")
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+def _format_errors(errors):
+    return [{"loc": list(error["loc"]), "msg": error["msg"], "type": error["type"]} for error in errors]
+
+def validate_batch(adapter, items, offset=0):
+    """Validate a whole batch in one pass; returns (documents, indexes, errors)"""
+    try:
+        records = adapter.validate_python(items)
+        return [r.model_dump() for r in records], list(range(offset, offset + len(items))), []
+    except ValidationError as e:
+        by_index = {}
+        for error in e.errors():
+            by_index.setdefault(error["loc"][0], []).append(error)
+
+    errors = [
+        {"index": offset + i, "errors": _format_errors([dict(err, loc=err["loc"][1:]) for err in errs])}
+        for i, errs in sorted(by_index.items())
+    ]
+    good = [i for i in range(len(items)) if i not in by_index]
+    # The remaining items are known to be valid, so this second pass cannot fail
+    records = adapter.validate_python([items[i] for i in good])
+    return [r.model_dump() for r in records], [offset + i for i in good], errors
+
+def write_batch(collection, documents, indexes, key_fields, upsert=False, on_write=None, defaults=None,
+                insert_only=()):
+    """Write validated documents without stopping at the first failure
+
+    With upsert, `defaults` fills fields a document lacks only when it creates a new
+    record, so values already stored are never overwritten by placeholders. Document
+    fields named in `insert_only` are likewise written only when a record is created.
+
+    on_write(written, replaced) receives the documents that were stored and the
+    previous versions of any they overwrote, so running aggregates can be updated.
+    """
+    result = {"inserted": 0, "upserted": 0, "modified": 0, "errors": []}
+    if not documents:
+        return result
+
+    existing = []
+    if upsert:
+        # Later duplicates of the same key win, as they would with sequential upserts
+        latest = {}
+        for position, doc in enumerate(documents):
+            latest[tuple(doc[k] for k in key_fields)] = position
+        keep = sorted(latest.values())
+        documents = [documents[i] for i in keep]
+        indexes = [indexes[i] for i in keep]
+        if on_write is not None:
+            existing = list(collection.find(
+                {"$or": [{k: doc[k] for k in key_fields} for doc in documents]},
+                {"_id": 0}
+            ))
+
+    failed = set()
+    try:
+        if upsert:
+            operations = []
+            for doc in documents:
+                update = {"$set": {k: v for k, v in doc.items() if k not in insert_only}}
+                on_insert = {k: v for k, v in doc.items() if k in insert_only}
+                on_insert.update({k: v for k, v in (defaults or {}).items() if k not in doc})
+                if on_insert:
+                    update["$setOnInsert"] = on_insert
+                operations.append(UpdateOne({k: doc[k] for k in key_fields}, update, upsert=True))
+            outcome = collection.bulk_write(operations, ordered=False)
+            result["upserted"] = outcome.upserted_count
+            result["modified"] = outcome.modified_count
+        else:
+            outcome = collection.insert_many(documents, ordered=False)
+            result["inserted"] = len(outcome.inserted_ids)
+    except BulkWriteError as e:
+        details = e.details
+        result["inserted"] = details.get("nInserted", 0)
+        result["upserted"] = details.get("nUpserted", 0)
+        result["modified"] = details.get("nModified", 0)
+        for write_error in details.get("writeErrors", []):
+            failed.add(write_error["index"])
+            result["errors"].append({
+                "index": indexes[write_error["index"]],
+                "errors": [{"loc": [], "msg": write_error.get("errmsg", ""), "type": f"write_error.{write_error.get('code')}"}]
+            })
+
+    if on_write is not None:
+        written = [doc for position, doc in enumerate(documents) if position not in failed]
+        written_keys = {tuple(doc[k] for k in key_fields) for doc in written}
+        replaced = [doc for doc in existing if tuple(doc.get(k) for k in key_fields) in written_keys]
+        on_write(written, replaced)
+    return result
+
+async def iter_ndjson(request):
+    """Yield (line_number, raw_line) from a streamed NDJSON body"""
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line_number, line
+                line_number += 1
+    if buffer.strip():
+        yield line_number, buffer
+
+async def iter_batches(request, batch_size):
+    """Yield (offset, items, parse_errors) batches from a JSON array or NDJSON body"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_TYPES:
+        offset, items, parse_errors = 0, [], []
+        async for line_number, line in iter_ndjson(request):
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                # Keep a placeholder so indexes stay aligned with input lines
+                items.append(None)
+                parse_errors.append({"index": line_number, "errors": [{"loc": [], "msg": str(e), "type": "json_invalid"}]})
+            if len(items) >= batch_size:
+                yield offset, items, parse_errors
+                offset, items, parse_errors = offset + len(items), [], []
+        if items:
+            yield offset, items, parse_errors
+        return
+
+    payload = json.loads(await request.body())
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON array or an NDJSON body")
+    for offset in range(0, len(payload), batch_size):
+        yield offset, payload[offset:offset + batch_size], []
+
+async def bulk_ingest(request, adapter, collection, key_fields, upsert=False, batch_size=1000, on_write=None):
+    summary = {"received": 0, "valid": 0, "inserted": 0, "upserted": 0, "modified": 0, "errors": []}
+    async for offset, items, parse_errors in iter_batches(request, batch_size):
+        failed = {error["index"] for error in parse_errors}
+        candidates = [(offset + i, item) for i, item in enumerate(items) if offset + i not in failed]
+        documents, indexes, validation_errors = validate_batch(adapter, [item for _, item in candidates])
+        # Map positions inside the candidate list back to input indexes
+        indexes = [candidates[i][0] for i in indexes]
+        for error in validation_errors:
+            error["index"] = candidates[error["index"]][0]
+
+        written = await run_db(write_batch, collection, documents, indexes, key_fields, upsert, on_write)
+
+        summary["received"] += len(items)
+        summary["valid"] += len(documents)
+        for field in ("inserted", "upserted", "modified"):
+            summary[field] += written[field]
+        summary["errors"].extend(parse_errors + validation_errors + written["errors"])
+
+    summary["errors"].sort(key=lambda error: error["index"])
+    return summary
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", 1000))
+# Cosine similarity needed for a near-duplicate hit; 0 disables fuzzy matching
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", 0))
+
+def normalize_query(query):
+    """Lowercase, drop punctuation (keeping % and decimals) and collapse whitespace"""
+    query = query.lower()
+    query = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", query)
+    query = re.sub(r"[^\w%.\s]", " ", query)
+    return " ".join(query.split())
+
+def context_fingerprint(context):
+    payload = json.dumps(context, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ChatCache:
+    """LRU of chatbot answers keyed on (context fingerprint, normalized query)"""
+
+    def __init__(self, max_entries=CHAT_CACHE_SIZE, similarity_threshold=CHAT_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _similar(self, fingerprint, normalized):
+        """Best cached query under the same context by TF-IDF cosine similarity"""
+        index = self._indexes.get(fingerprint)
+        if index is None:
+            queries = [q for fp, q in self._entries if fp == fingerprint]
+            if not queries:
+                return None
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)
+            matrix = vectorizer.fit_transform(queries)
+            index = self._indexes[fingerprint] = (queries, vectorizer, matrix)
+
+        queries, vectorizer, matrix = index
+        vector = vectorizer.transform([normalized])
+        if vector.nnz == 0:
+            return None
+        # Rows are L2-normalised, so the dot product is the cosine similarity
+        scores = (matrix @ vector.T).toarray().ravel()
+        best = int(scores.argmax())
+        if scores[best] >= self.similarity_threshold:
+            return queries[best]
+        return None
+
+    def get(self, query, context):
+        fingerprint = context_fingerprint(context)
+        normalized = normalize_query(query)
+        with self._lock:
+            key = (fingerprint, normalized)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return self._entries[key]
+            if self.similarity_threshold > 0:
+                match = self._similar(fingerprint, normalized)
+                if match is not None:
+                    self._entries.move_to_end((fingerprint, match))
+                    self.similar_hits += 1
+                    return self._entries[(fingerprint, match)]
+            self.misses += 1
+            return None
+
+    def set(self, query, context, response):
+        fingerprint = context_fingerprint(context)
+        with self._lock:
+            self._entries[(fingerprint, normalize_query(query))] = response
+            self._indexes.pop(fingerprint, None)
+            while len(self._entries) > self.max_entries:
+                (evicted_fingerprint, _), _ = self._entries.popitem(last=False)
+                self._indexes.pop(evicted_fingerprint, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._indexes.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "similarity_threshold": self.similarity_threshold,
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0
+            }
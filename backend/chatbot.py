@@ -1,48 +1,221 @@
-import google.generativeai as genai
+import asyncio
+import hashlib
+import logging
 import os
+import time
 from dotenv import load_dotenv
 
+from metrics import LLM_CALL_SECONDS
+
 load_dotenv()
+logger = logging.getLogger(__name__)
 
-class BusinessChatbot:
-    def __init__(self):
+# Try importing the Gemini client with fallback so the stub backend works offline
+try:
+    import google.generativeai as genai
+    GENAI_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"google-generativeai import warning: {e}")
+    GENAI_AVAILABLE = False
+
+CHAT_BACKEND = os.getenv("CHAT_BACKEND", "gemini")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 4))
+STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", 0))
+
+class GeminiBackend:
+    def __init__(self, model_name='gemini-pro'):
+        if not GENAI_AVAILABLE:
+            raise RuntimeError("google-generativeai is not installed; set CHAT_BACKEND=stub")
         genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.model = genai.GenerativeModel('gemini-pro')
-        
-    def generate_response(self, query, context):
-        prompt = f"""
-        You are an AI business analyst for a smartphone company. 
+        self.model = genai.GenerativeModel(model_name)
+
+    async def generate(self, prompt):
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+    async def stream(self, prompt):
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+class StubBackend:
+    """Deterministic offline backend for load tests: same prompt, same answer"""
+
+    def __init__(self, latency=STUB_LLM_LATENCY):
+        self.latency = latency
+
+    def answer(self, prompt):
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        question = prompt.rsplit("Business Question:", 1)[-1].strip().splitlines()[0] if "Business Question:" in prompt else ""
+        return (
+            f"[stub:{digest}] Analysis for: {question}\n"
+            "1. Key drivers: price and camera specifications dominate recent sales.\n"
+            "2. Recommendation: review pricing against the closest competitor launch.\n"
+            "3. Opportunity: bundle storage upgrades in the mid-range segment."
+        )
+
+    async def generate(self, prompt):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.answer(prompt)
+
+    async def stream(self, prompt):
+        # Spread the configured latency over the tokens so time-to-first-token is realistic
+        tokens = self.answer(prompt).split(" ")
+        delay = self.latency / len(tokens) if self.latency else 0
+        for i, token in enumerate(tokens):
+            if delay:
+                await asyncio.sleep(delay)
+            yield token if i == 0 else " " + token
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+
+def create_backend(name=CHAT_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown chat backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+class ContextSnapshot:
+    """TTL-cached result of an async loader, refreshed by at most one caller at a time"""
+
+    def __init__(self, loader, ttl=60):
+        self.loader = loader
+        self.ttl = ttl
+        self.value = None
+        self.expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self):
+        if self.value is not None and time.monotonic() < self.expires_at:
+            return self.value
+        async with self._lock:
+            if self.value is None or time.monotonic() >= self.expires_at:
+                self.value = await self.loader()
+                self.expires_at = time.monotonic() + self.ttl
+        return self.value
+
+    def invalidate(self):
+        self.expires_at = 0.0
+
+class BusinessChatbot:
+    def __init__(self, backend=None, timeout=LLM_TIMEOUT, max_concurrency=LLM_CONCURRENCY, cache=None):
+        self.backend = backend or create_backend()
+        self.timeout = timeout
+        self.cache = cache
+        # Caps in-flight upstream calls; extra requests wait here instead of piling onto the API
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    def build_prompt(self, query, context):
+        return f"""
+        You are an AI business analyst for a smartphone company.
         Use the following data context to answer the business question:
-        
+
         Context:
         {context}
-        
+
         Business Question: {query}
-        
+
         Provide a professional, data-driven answer with specific insights and recommendations.
         """
-        
+
+    async def complete(self, prompt):
+        async with self.semaphore:
+            # Timed after the semaphore so the histogram shows upstream latency, not queueing
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                response = await asyncio.wait_for(self.backend.generate(prompt), timeout=self.timeout)
+                outcome = "ok"
+                return response
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise
+            finally:
+                LLM_CALL_SECONDS.observe(time.perf_counter() - started, "complete", outcome)
+
+    async def generate_response(self, query, context):
+        if self.cache is not None:
+            cached = self.cache.get(query, context)
+            if cached is not None:
+                return cached
+
+        prompt = self.build_prompt(query, context)
+
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            response = await self.complete(prompt)
+        except asyncio.TimeoutError:
+            return f"Error generating response: no answer within {self.timeout:.0f}s"
         except Exception as e:
             return f"Error generating response: {str(e)}"
-    
-    def analyze_sales_trend(self, sales_data, features):
+
+        # Only successful answers are cached
+        if self.cache is not None:
+            self.cache.set(query, context, response)
+        return response
+
+    async def stream_response(self, query, context):
+        """Yield the answer in chunks as the backend produces them"""
+        if self.cache is not None:
+            cached = self.cache.get(query, context)
+            if cached is not None:
+                yield cached
+                return
+
+        prompt = self.build_prompt(query, context)
+        chunks = []
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout
+            started = time.perf_counter()
+            outcome = "error"
+            stream = self.backend.stream(prompt)
+            try:
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                    except StopAsyncIteration:
+                        break
+                    chunks.append(chunk)
+                    yield chunk
+                outcome = "ok"
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise
+            except GeneratorExit:
+                # Client went away mid-answer
+                outcome = "cancelled"
+                raise
+            finally:
+                LLM_CALL_SECONDS.observe(time.perf_counter() - started, "stream", outcome)
+                await stream.aclose()
+
+        if self.cache is not None:
+            self.cache.set(query, context, "".join(chunks))
+
+    async def analyze_sales_trend(self, sales_data, features):
         context = f"""
         Sales Data: {sales_data}
         Feature Importance: {features}
-        
+
         Analyze the sales trend and provide insights on:
         1. Key factors affecting sales
         2. Recommendations for improvement
         3. Market opportunities
         """
-        
+
         prompt = f"Based on this data, provide a comprehensive business analysis: {context}"
-        
+
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return await self.complete(prompt)
+        except asyncio.TimeoutError:
+            return f"Error in analysis: no answer within {self.timeout:.0f}s"
         except Exception as e:
-            return f"Error in analysis: {str(e)}"
\ No newline at end of file
+            return f"Error in analysis: {str(e)}"
@@ -0,0 +1,125 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from bulk_ingest import PRODUCT_KEY, write_batch
+from database import CATALOG_CURRENCY
+
+DEFAULT_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "sales.csv")
+
+CSV_COLUMNS = ["Brands", "Memory", "Storage", "Rating", "Selling Price", "Original Price", "Mobile"]
+
+_UNIT_TO_GB = {"MB": 1 / 1024, "GB": 1, "TB": 1024}
+
+# The catalog CSV has no battery or camera resolution. New products get the seeded
+# catalog's medians so they can be scored, and list them under imputed_specs; the
+# placeholders are only set on insert, never over specs that are already stored.
+SPEC_DEFAULTS = {"battery": 4600, "camera_mp": 50}
+
+# CSV prices are Indian rupees. They are kept as listed in price_inr/original_price_inr
+# and converted for the catalog fields, which are only set on insert so an existing
+# product's catalog price is never replaced by a converted marketplace listing.
+INR_PER_USD = float(os.getenv("INR_PER_USD", 83.0))
+INSERT_ONLY_FIELDS = ("price", "original_price", "currency")
+
+def parse_size_gb(values):
+    """Parse strings like '8 GB', '4GB' or '512 MB' into whole gigabytes (NaN when missing)"""
+    parts = values.astype("string").str.extract(r"([\d.]+)\s*(MB|GB|TB)", expand=True)
+    amount = pd.to_numeric(parts[0], errors="coerce")
+    factor = parts[1].map(_UNIT_TO_GB).astype(float)
+    return (amount * factor).round()
+
+def chunk_to_products(chunk):
+    """Normalise one CSV chunk into smartphone documents, deduplicated by Mobile"""
+    frame = pd.DataFrame({
+        "brand": chunk["Brands"].astype("string").str.strip(),
+        "model": chunk["Mobile"].astype("string").str.strip().str.replace(r"\s+", " ", regex=True),
+        "price_inr": pd.to_numeric(chunk["Selling Price"], errors="coerce"),
+        "original_price_inr": pd.to_numeric(chunk["Original Price"], errors="coerce"),
+        "ram": parse_size_gb(chunk["Memory"]),
+        "storage": parse_size_gb(chunk["Storage"]),
+        "rating": pd.to_numeric(chunk["Rating"], errors="coerce"),
+    })
+    frame = frame.dropna(subset=["model"])
+    frame = frame[frame["model"] != ""]
+    frame = frame.drop_duplicates(subset="model", keep="last")
+    frame["os"] = np.where(frame["brand"].fillna("").str.lower() == "apple", "iOS", "Android")
+    frame["price"] = (frame["price_inr"] / INR_PER_USD).round(2)
+    frame["original_price"] = (frame["original_price_inr"] / INR_PER_USD).round(2)
+    frame["currency"] = CATALOG_CURRENCY
+
+    documents = []
+    for record in frame.to_dict("records"):
+        doc = {}
+        for key, value in record.items():
+            if value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+                continue
+            if key in ("ram", "storage"):
+                value = int(value)
+            doc[key] = value if not hasattr(value, "item") else value.item()
+        documents.append(doc)
+    return documents
+
+def import_smartphones_csv(path, collection, chunksize=10000, progress=None):
+    """Stream a smartphone catalog CSV into the collection, upserting on model
+
+    Only one chunk is held in memory at a time, so file size is bounded by disk, not RAM.
+    """
+    total_bytes = os.path.getsize(path)
+    summary = {
+        "path": path,
+        "total_bytes": total_bytes,
+        "bytes_read": 0,
+        "rows_read": 0,
+        "products": 0,
+        "upserted": 0,
+        "modified": 0,
+        "errors": [],
+        "progress": 0.0,
+    }
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        reader = pd.read_csv(f, chunksize=chunksize, usecols=CSV_COLUMNS, dtype=str, keep_default_na=True)
+        for chunk in reader:
+            documents = chunk_to_products(chunk)
+            offset = summary["rows_read"]
+            written = write_batch(
+                collection, documents, list(range(offset, offset + len(documents))), PRODUCT_KEY, upsert=True,
+                defaults={**SPEC_DEFAULTS, "imputed_specs": sorted(SPEC_DEFAULTS)}, insert_only=INSERT_ONLY_FIELDS
+            )
+
+            summary["rows_read"] += len(chunk)
+            summary["products"] += len(documents)
+            summary["upserted"] += written["upserted"]
+            summary["modified"] += written["modified"]
+            summary["errors"].extend(written["errors"])
+            summary["bytes_read"] = min(f.tell(), total_bytes)
+            summary["progress"] = summary["bytes_read"] / total_bytes if total_bytes else 1.0
+            summary["elapsed_seconds"] = time.perf_counter() - started
+            if progress is not None:
+                progress(summary)
+
+    summary["progress"] = 1.0
+    summary["elapsed_seconds"] = time.perf_counter() - started
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a smartphone catalog CSV into MongoDB")
+    parser.add_argument("path", nargs="?", default=DEFAULT_CSV_PATH)
+    parser.add_argument("--chunksize", type=int, default=10000)
+    args = parser.parse_args()
+
+    from database import smartphones_collection
+
+    def report(summary):
+        print(f"{summary['progress']:6.1%}  rows={summary['rows_read']}  products={summary['products']}  "
+              f"upserted={summary['upserted']}  modified={summary['modified']}")
+
+    summary = import_smartphones_csv(args.path, smartphones_collection, args.chunksize, report)
+    print(f"Done in {summary['elapsed_seconds']:.1f}s with {len(summary['errors'])} errors")
+
+if __name__ == "__main__":
+    main()
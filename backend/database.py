@@ -1,12 +1,18 @@
 from pymongo import MongoClient
+import asyncio
+import functools
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # MongoDB connection (local)
-MONGO_URI = "mongodb://localhost:27017/"
-client = MongoClient(MONGO_URI)
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_CONCURRENCY = int(os.getenv("MONGO_CONCURRENCY", 32))
+# Every product price is stored in this currency; models compare prices across the catalog
+CATALOG_CURRENCY = "USD"
+client = MongoClient(MONGO_URI, maxPoolSize=MONGO_CONCURRENCY)
 db = client["smartphone_sales"]
 
 # Collections
@@ -14,15 +20,182 @@ smartphones_collection = db["smartphones"]
 sales_collection = db["sales_data"]
 predictions_collection = db["predictions"]
 feature_importance_collection = db["feature_importance"]
+dashboard_summary_collection = db["dashboard_summary"]
+backtest_results_collection = db["backtest_results"]
+
+# Blocking pymongo calls run here so async handlers never stall the event loop;
+# the pool size caps concurrent queries and matches the client connection pool
+db_executor = ThreadPoolExecutor(max_workers=MONGO_CONCURRENCY, thread_name_prefix="mongo")
+
+async def run_db(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(fn, *args, **kwargs))
+
+class AsyncCollection:
+    """Awaitable wrapper around a pymongo collection; cursors are materialised in the pool"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return await run_db(self.collection.find_one, *args, **kwargs)
+
+    async def find(self, filter=None, projection=None, sort=None, limit=0, skip=0):
+        def query():
+            cursor = self.collection.find(filter or {}, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            if skip:
+                cursor = cursor.skip(skip)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        return await run_db(query)
+
+    async def aggregate(self, pipeline, **kwargs):
+        return await run_db(lambda: list(self.collection.aggregate(pipeline, **kwargs)))
+
+    async def count_documents(self, *args, **kwargs):
+        return await run_db(self.collection.count_documents, *args, **kwargs)
+
+    async def insert_one(self, *args, **kwargs):
+        return await run_db(self.collection.insert_one, *args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs):
+        return await run_db(self.collection.insert_many, *args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return await run_db(self.collection.update_one, *args, **kwargs)
+
+    async def bulk_write(self, *args, **kwargs):
+        return await run_db(self.collection.bulk_write, *args, **kwargs)
+
+async_smartphones_collection = AsyncCollection(smartphones_collection)
+async_sales_collection = AsyncCollection(sales_collection)
+async_predictions_collection = AsyncCollection(predictions_collection)
+async_feature_importance_collection = AsyncCollection(feature_importance_collection)
+async_dashboard_summary_collection = AsyncCollection(dashboard_summary_collection)
+async_backtest_results_collection = AsyncCollection(backtest_results_collection)
+
+# Single document holding running sales totals for the dashboard
+SALES_SUMMARY_ID = "sales"
+
+SALES_SUMMARY_PIPELINE = [
+    {"$facet": {
+        "totals": [{"$group": {
+            "_id": None,
+            "total_units": {"$sum": "$units_sold"},
+            "total_revenue": {"$sum": "$revenue"},
+            "avg_sales": {"$avg": "$units_sold"},
+            "count": {"$sum": 1}
+        }}],
+        "latest_month": [
+            {"$group": {"_id": None, "month": {"$max": "$month"}}}
+        ]
+    }}
+]
+
+def rebuild_dashboard_summary():
+    """Recompute the summary from every sales document in one $facet pass"""
+    result = list(sales_collection.aggregate(SALES_SUMMARY_PIPELINE))[0]
+    totals = result["totals"][0] if result["totals"] else {}
+    latest = result["latest_month"][0]["month"] if result["latest_month"] else None
+    summary = {
+        "total_units": totals.get("total_units", 0),
+        "total_revenue": totals.get("total_revenue", 0),
+        "count": totals.get("count", 0),
+        "latest_month": latest
+    }
+    dashboard_summary_collection.replace_one({"_id": SALES_SUMMARY_ID}, summary, upsert=True)
+    return summary
+
+def record_sales_write(written, replaced=()):
+    """Apply the delta of inserted/overwritten sales documents to the running summary"""
+    written = list(written)
+    replaced = list(replaced)
+    if not written:
+        return
+    update = {"$inc": {
+        "total_units": sum(d.get("units_sold", 0) for d in written) - sum(d.get("units_sold", 0) for d in replaced),
+        "total_revenue": sum(d.get("revenue", 0) for d in written) - sum(d.get("revenue", 0) for d in replaced),
+        "count": len(written) - len(replaced)
+    }}
+    latest = max((d["month"] for d in written if d.get("month")), default=None)
+    if latest is not None:
+        update["$max"] = {"latest_month": latest}
+    dashboard_summary_collection.update_one({"_id": SALES_SUMMARY_ID}, update, upsert=True)
+
+def get_dashboard_summary():
+    summary = dashboard_summary_collection.find_one({"_id": SALES_SUMMARY_ID})
+    if summary is None:
+        summary = rebuild_dashboard_summary()
+    count = summary.get("count", 0)
+    return {
+        "total_units": summary.get("total_units", 0),
+        "total_revenue": summary.get("total_revenue", 0),
+        "avg_sales": summary.get("total_units", 0) / count if count else 0,
+        "count": count,
+        "latest_month": summary.get("latest_month")
+    }
+
+SALES_TREND_MAX_LIMIT = 1000
+
+def query_sales_trend(brand=None, model=None, start_month=None, end_month=None, after=None, limit=120):
+    """Monthly unit/revenue rollup computed in Mongo, one page of months at a time
+
+    Returns (rows, next_after) where next_after is the cursor for the following page.
+    """
+    limit = max(1, min(limit, SALES_TREND_MAX_LIMIT))
+    match = {}
+    if model:
+        match["model"] = model
+    elif brand:
+        # Sales rows carry only the model, so resolve the brand's models first
+        models = smartphones_collection.distinct("model", {"brand": brand})
+        match["model"] = {"$in": models}
+    
+    month = {}
+    if start_month:
+        month["$gte"] = start_month
+    if end_month:
+        month["$lte"] = end_month
+    if after:
+        month["$gt"] = after
+    if month:
+        match["month"] = month
+    
+    pipeline = [{"$match": match}] if match else []
+    pipeline += [
+        {"$project": {"_id": 0, "month": 1, "units_sold": 1, "revenue": 1}},
+        {"$group": {
+            "_id": "$month",
+            "units_sold": {"$sum": "$units_sold"},
+            "revenue": {"$sum": "$revenue"},
+            "models": {"$sum": 1}
+        }},
+        {"$sort": {"_id": 1}},
+        {"$limit": limit + 1},
+        {"$project": {"_id": 0, "month": "$_id", "units_sold": 1, "revenue": 1, "models": 1}}
+    ]
+    rows = list(sales_collection.aggregate(pipeline))
+    next_after = rows[limit - 1]["month"] if len(rows) > limit else None
+    return rows[:limit], next_after
 
 def init_database():
     # Create indexes
     smartphones_collection.create_index("model", unique=True)
     sales_collection.create_index([("model", 1), ("month", 1)], unique=True)
+    sales_collection.create_index("month")
+    feature_importance_collection.create_index([("model", 1), ("kind", 1), ("version", -1)])
+    smartphones_collection.create_index("brand")
+    backtest_results_collection.create_index([("model", 1), ("created_at", -1)])
     
     # Load sample data if collections are empty
     if smartphones_collection.count_documents({}) == 0:
         load_sample_data()
+    
+    if dashboard_summary_collection.count_documents({"_id": SALES_SUMMARY_ID}) == 0:
+        rebuild_dashboard_summary()
 
 def load_sample_data():
     # Extended sample smartphones with more brands
@@ -96,4 +269,4 @@ def load_sample_data():
         {"brand": "Nokia", "model": "G60 5G", "price": 299, "ram": 4, "storage": 64, "battery": 4500, "camera_mp": 50, "os": "Android", "launch_date": "2022-09-01"},
         {"brand": "Nokia", "model": "X30 5G", "price": 399, "ram": 6, "storage": 128, "battery": 4200, "camera_mp": 50, "os": "Android", "launch_date": "2022-09-01"},
     ]
-    smartphones_collection.insert_many(sample_phones)
\ No newline at end of file
+    smartphones_collection.insert_many([{**phone, "currency": CATALOG_CURRENCY} for phone in sample_phones])
\ No newline at end of file
@@ -0,0 +1,285 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+SEASON_LENGTH = 12
+Z_95 = 1.96
+# Longest horizon the forecast endpoint serves; components are fitted once at this length
+MAX_FORECAST_PERIODS = int(os.getenv("MAX_FORECAST_PERIODS", 12))
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", 512))
+
+def build_series_matrix(sales_data, value='units_sold'):
+    """Pivot sales rows into a products x months array (NaN where a month is missing)
+
+    Returns (model_names, months, Y). Months are filled into a continuous monthly range
+    when they parse as dates, so gaps show up as NaN rather than being skipped.
+    """
+    df = pd.DataFrame(sales_data, columns=['model', 'month', value])
+    if df.empty:
+        return [], [], np.zeros((0, 0))
+    pivot = df.pivot_table(index='model', columns='month', values=value, aggfunc='sum')
+    try:
+        periods = pd.PeriodIndex(pd.to_datetime(pivot.columns), freq='M')
+        pivot.columns = periods
+        pivot = pivot.T.groupby(level=0).sum(min_count=1).T
+        full_range = pd.period_range(pivot.columns.min(), pivot.columns.max(), freq='M')
+        pivot = pivot.reindex(columns=full_range)
+        months = [str(p) for p in pivot.columns]
+    except (ValueError, TypeError):
+        pivot = pivot.reindex(columns=sorted(pivot.columns))
+        months = [str(m) for m in pivot.columns]
+    return list(pivot.index), months, pivot.to_numpy(dtype=float)
+
+def future_months(months, periods):
+    """Labels for the next `periods` months after the last observed one"""
+    if not months:
+        return [f"t+{h}" for h in range(1, periods + 1)]
+    try:
+        last = pd.Period(months[-1], freq='M')
+        return [str(last + h) for h in range(1, periods + 1)]
+    except (ValueError, TypeError):
+        return [f"{months[-1]}+{h}" for h in range(1, periods + 1)]
+
+def exponential_smoothing_forecast(Y, periods=6, alpha=0.4, beta=0.1, gamma=0.1, phi=0.98,
+                                   season_length=SEASON_LENGTH, z=Z_95):
+    """Damped-trend Holt-Winters (additive) fitted to every row of Y at once
+
+    Y is products x months with NaN for unobserved months. The recursion runs over
+    months only; each step updates all products with array operations. Seasonality
+    is used for rows with at least two full seasons of history. Returns a dict of
+    products x periods arrays: forecast, lower, upper (clipped at zero), plus sigma.
+    """
+    Y = np.asarray(Y, dtype=float)
+    n_products, n_months = Y.shape if Y.ndim == 2 else (0, 0)
+    if n_products == 0:
+        empty = np.zeros((0, periods))
+        return {"forecast": empty, "lower": empty, "upper": empty, "sigma": np.zeros(0)}
+
+    observed = ~np.isnan(Y)
+    n_observed = observed.sum(axis=1)
+    seasonal_rows = n_observed >= 2 * season_length
+
+    # Initial level/trend from the first observations of each row
+    first_idx = np.where(observed.any(axis=1), observed.argmax(axis=1), 0)
+    rows = np.arange(n_products)
+    level = np.where(observed.any(axis=1), Y[rows, first_idx], 0.0)
+    level = np.nan_to_num(level)
+    trend = np.zeros(n_products)
+    season = np.zeros((n_products, season_length))
+    started = np.zeros(n_products, dtype=bool)
+
+    squared_errors = np.zeros(n_products)
+    n_errors = np.zeros(n_products)
+
+    for t in range(n_months):
+        y = Y[:, t]
+        has_value = observed[:, t]
+        slot = t % season_length
+        seasonal = np.where(seasonal_rows, season[:, slot], 0.0)
+
+        # One-step-ahead error for rows past their first observation
+        prediction = level + phi * trend + seasonal
+        scored = has_value & started
+        error = np.where(scored, y - prediction, 0.0)
+        squared_errors += error ** 2
+        n_errors += scored
+
+        y_filled = np.where(has_value, y, prediction)
+        new_level = np.where(
+            started,
+            alpha * (y_filled - seasonal) + (1 - alpha) * (level + phi * trend),
+            y_filled
+        )
+        new_trend = np.where(started, beta * (new_level - level) + (1 - beta) * phi * trend, 0.0)
+        new_season = np.where(
+            started & seasonal_rows,
+            gamma * (y_filled - new_level) + (1 - gamma) * seasonal,
+            seasonal
+        )
+
+        # Months without data leave the state untouched apart from trend propagation
+        level = np.where(has_value | started, new_level, level)
+        trend = np.where(has_value, new_trend, trend)
+        season[:, slot] = np.where(has_value, new_season, season[:, slot])
+        started |= has_value
+
+    horizon = np.arange(1, periods + 1)
+    damped = np.cumsum(phi ** horizon)
+    future_slots = (n_months + horizon - 1) % season_length
+    seasonal_future = np.where(seasonal_rows[:, None], season[:, future_slots], 0.0)
+    forecast = level[:, None] + trend[:, None] * damped[None, :] + seasonal_future
+
+    # ETS(A,Ad,N)-style variance growth with the horizon
+    sigma = np.sqrt(squared_errors / np.maximum(n_errors, 1))
+    growth = np.concatenate([[0.0], np.cumsum((alpha * (1 + beta * damped[:-1])) ** 2)])
+    spread = z * sigma[:, None] * np.sqrt(1 + growth[None, :])
+
+    return {
+        "forecast": np.maximum(forecast, 0),
+        "lower": np.maximum(forecast - spread, 0),
+        "upper": np.maximum(forecast + spread, 0),
+        "sigma": sigma
+    }
+
+def forecast_catalog(sales_data, periods=6, **params):
+    """Forecast every product's monthly series in one vectorized pass"""
+    model_names, months, Y = build_series_matrix(sales_data)
+    result = exponential_smoothing_forecast(Y, periods, **params)
+    result.update(models=model_names, history_months=months, months=future_months(months, periods))
+    return result
+
+def forecast_series(sales_data, periods=MAX_FORECAST_PERIODS, **params):
+    """Forecast one product's sales rows; returns plain lists ready to slice by horizon"""
+    result = forecast_catalog(sales_data, periods, **params)
+    if not result["models"]:
+        return None
+    return {
+        "months": result["months"],
+        "forecast": result["forecast"][0].tolist(),
+        "lower": result["lower"][0].tolist(),
+        "upper": result["upper"][0].tolist(),
+        "history_months": result["history_months"]
+    }
+
+class ComponentCache:
+    """LRU of fitted forecast components keyed on (model, component)
+
+    Each entry remembers a fingerprint of the inputs it was built from; a lookup with a
+    different fingerprint is a miss, so stale components are never served.
+    """
+
+    def __init__(self, max_entries=FORECAST_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_name, component, fingerprint=None):
+        key = (model_name, component)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(self, model_name, component, value, fingerprint=None):
+        key = (model_name, component)
+        with self._lock:
+            self._entries[key] = (fingerprint, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, model_name=None, component=None):
+        """Drop matching entries; no arguments clears everything"""
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if (model_name is None or key[0] == model_name) and (component is None or key[1] == component)
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+def summing_matrix(model_names, brands):
+    """Sparse S mapping model-level values onto [total, brands..., models...]
+
+    Returns (S, brand_names); row 0 is the market total, the next rows one per brand
+    and the last len(model_names) rows the identity.
+    """
+    brand_names = sorted(set(brands))
+    brand_index = {brand: i for i, brand in enumerate(brand_names)}
+    n_models = len(model_names)
+    columns = np.arange(n_models)
+    brand_rows = sparse.csr_matrix(
+        (np.ones(n_models), ([brand_index[brand] for brand in brands], columns)),
+        shape=(len(brand_names), n_models)
+    )
+    total_row = sparse.csr_matrix(np.ones((1, n_models)))
+    S = sparse.vstack([total_row, brand_rows, sparse.identity(n_models, format='csr')], format='csr')
+    return S, brand_names
+
+def reconcile(S, base, sigma=None, method='mint'):
+    """Make base forecasts for every node add up across the hierarchy
+
+    base is nodes x periods in the row order of S. 'bottom_up' keeps the model
+    forecasts and sums them. 'mint' is MinT with a diagonal covariance (weights
+    1/sigma^2): the bottom level is solved with the Woodbury identity, so only a
+    small dense system of size aggregates x aggregates is factorised.
+    """
+    base = np.asarray(base, dtype=float)
+    n_models = S.shape[1]
+    n_aggregates = S.shape[0] - n_models
+    if method == 'bottom_up' or sigma is None:
+        return S @ base[n_aggregates:]
+    if method != 'mint':
+        raise ValueError(f"Unknown reconciliation method '{method}', expected 'mint' or 'bottom_up'")
+
+    # Nodes with no in-sample error get the typical variance rather than infinite weight
+    sigma = np.asarray(sigma, dtype=float)
+    positive = sigma[sigma > 0]
+    fallback = np.median(positive) if positive.size else 1.0
+    weights = 1.0 / np.where(sigma > 0, sigma, fallback) ** 2
+
+    # (S' W S)^-1 S' W base with S' W S = D + U C U' (D: model weights, U: aggregate rows)
+    D = weights[n_aggregates:]
+    U = S[:n_aggregates].T.tocsr()
+    rhs = (S.T @ (weights[:, None] * base)) / D[:, None]
+    U_scaled = sparse.diags(1.0 / D) @ U
+    inner = np.diag(1.0 / weights[:n_aggregates]) + (U.T @ U_scaled).toarray()
+    bottom = rhs - U_scaled @ np.linalg.solve(inner, U.T @ rhs)
+    return S @ bottom
+
+def forecast_hierarchy(sales_data, brand_by_model, periods=6, method='mint', **params):
+    """Coherent total / brand / model forecasts for the whole catalog
+
+    Every node's history is aggregated with one sparse product, all nodes are
+    forecast in a single smoothing pass, then reconciled so brands sum to the total
+    and models sum to their brand.
+    """
+    model_names, months, Y = build_series_matrix(sales_data)
+    if not model_names:
+        return {"levels": [], "names": [], "brands": [], "months": future_months(months, periods),
+                "forecast": np.zeros((0, periods)), "base": np.zeros((0, periods))}
+    brands = [brand_by_model.get(name) or "Unknown" for name in model_names]
+    S, brand_names = summing_matrix(model_names, brands)
+    n_aggregates = 1 + len(brand_names)
+
+    # Aggregate months with no observed child stay missing instead of reading as zero
+    observed = ~np.isnan(Y)
+    aggregates = S[:n_aggregates] @ np.nan_to_num(Y)
+    aggregates[(S[:n_aggregates] @ observed.astype(float)) == 0] = np.nan
+    history = np.vstack([aggregates, Y])
+
+    base = exponential_smoothing_forecast(history, periods, **params)
+    # Clip at the model level and re-aggregate so the zero floor keeps totals coherent
+    bottom = reconcile(S, base["forecast"], base["sigma"], method)[n_aggregates:]
+    forecast = S @ np.maximum(bottom, 0)
+    return {
+        "levels": ["total"] + ["brand"] * len(brand_names) + ["model"] * len(model_names),
+        "names": ["Total"] + brand_names + model_names,
+        "brands": [None] + brand_names + brands,
+        "months": future_months(months, periods),
+        "forecast": forecast,
+        "base": base["forecast"]
+    }
@@ -1,19 +1,36 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import json
 import pandas as pd
 import numpy as np
 from datetime import datetime
 import logging
+import tempfile
+import uuid
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
-from models import Product, SalesData, SimulationRequest, ChatRequest
+from models import Product, SalesData, SimulationRequest, ChatRequest, BatchPredictionRequest, GridSimulationRequest
 from database import *
-from ml_model import MLModels
+from ml_model import (FEATURE_COLUMNS, MissingSpecsError, build_training_frame, catalog_training_rows, product_features,
+                      blend_forecasts)
+from model_registry import ModelRegistry
+from forecasting import forecast_catalog, forecast_hierarchy, forecast_series, ComponentCache, MAX_FORECAST_PERIODS
+from model_cache import ModelCache
+from bulk_ingest import bulk_ingest, PRODUCT_ADAPTER, SALES_ADAPTER, PRODUCT_KEY, SALES_KEY
+from csv_import import import_smartphones_csv, DEFAULT_CSV_PATH
+from chat_cache import ChatCache
+from response_cache import ResponseCache
+from training_jobs import TrainingJobQueue, QueueFullError
+from backtesting import CATALOG_KEY
 from shap_analysis import ShapAnalyzer
-from chatbot import BusinessChatbot
+from chatbot import BusinessChatbot, ContextSnapshot
+from metrics import registry as metrics_registry, MetricsMiddleware, cache_collector, observe_stages, stage, CONTENT_TYPE
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -30,18 +47,158 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+MAX_GRID_POINTS = int(os.getenv("MAX_GRID_POINTS", 1000000))
+CHAT_CONTEXT_TTL = float(os.getenv("CHAT_CONTEXT_TTL", 60))
+TUNE_BUDGET = float(os.getenv("TUNE_BUDGET", 300))
+MAX_TUNE_BUDGET = float(os.getenv("MAX_TUNE_BUDGET", 3600))
+# Catalog-wide regressor behind spec simulations; refreshed in the background once older than the max age
+SPEC_MODEL = "__catalog_specs__"
+SPEC_MODEL_MIN_PRODUCTS = int(os.getenv("SPEC_MODEL_MIN_PRODUCTS", 3))
+SPEC_MODEL_MAX_AGE = float(os.getenv("SPEC_MODEL_MAX_AGE", 3600))
 
 # Initialize components
-ml_models = MLModels()
-chatbot = BusinessChatbot()
+model_registry = ModelRegistry()
+model_cache = ModelCache(model_registry.load)
+response_cache = ResponseCache()
+forecast_components = ComponentCache()
+
+def on_training_complete(model_name, result):
+    response_cache.invalidate(f"model:{model_name}")
+    # Worker-side timings (frame build, model fits) are only known once the job returns
+    observe_stages(result.get("stage_timings") if result else None)
+
+training_jobs = TrainingJobQueue(model_registry, model_cache, on_complete=on_training_complete)
+chat_cache = ChatCache()
+chatbot = BusinessChatbot(cache=chat_cache)
+import_jobs = {}
+metrics_registry.add_collector(cache_collector({
+    "model": model_cache,
+    "response": response_cache,
+    "chat": chat_cache,
+    "forecast_components": forecast_components
+}))
 
 @app.on_event("startup")
 async def startup_event():
     try:
-        init_database()
+        await run_db(init_database)
         logger.info("Database initialized")
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
+    try:
+        loaded = await asyncio.to_thread(model_cache.warm, model_registry.model_names())
+        logger.info(f"Loaded {loaded} trained models from registry")
+    except Exception as e:
+        logger.error(f"Model registry load error: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    training_jobs.shutdown()
+
+async def fetch_training_data(model_name):
+    with stage("mongo_fetch"):
+        product = await async_smartphones_collection.find_one({"model": model_name}, {"_id": 0})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        sales_data = await async_sales_collection.find({"model": model_name}, {"_id": 0})
+    if not sales_data:
+        raise HTTPException(status_code=404, detail="Sales data not found")
+    return product, sales_data
+
+def submit_training(model_name, product, sales_data, incremental=False, tune_budget=None):
+    try:
+        return training_jobs.submit(model_name, product, sales_data, incremental, tune_budget)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        # The queue recorded the job as failed and resets its pool for the next submit
+        raise HTTPException(status_code=503, detail=f"Training for '{model_name}' could not start: {e}")
+
+def scoring_features(product):
+    """product_features for a route: products without the model's specs are a 422, not a 500"""
+    try:
+        return product_features(product)
+    except MissingSpecsError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+async def get_trained_model(model_name, retrain=False):
+    entry = None if retrain else await model_cache.aget(model_name)
+    if entry is None:
+        # Train in the worker pool so the event loop stays free. An explicit retrain
+        # refits from scratch; incremental updates are for /train and background jobs
+        product, sales_data = await fetch_training_data(model_name)
+        job = submit_training(model_name, product, sales_data)
+        try:
+            await training_jobs.wait(job["id"])
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        entry = await model_cache.aget(model_name)
+        if entry is None:
+            raise HTTPException(
+                status_code=503, detail=f"Training job {job['id']} finished without a stored model for '{model_name}'"
+            )
+    return entry
+
+async def train_spec_model():
+    with stage("mongo_fetch"):
+        products = await async_smartphones_collection.find({}, {"_id": 0})
+        sales_data = await async_sales_collection.find({}, {"_id": 0, "model": 1, "month": 1, "units_sold": 1})
+    rows, n_products = catalog_training_rows(products, sales_data)
+    if n_products < SPEC_MODEL_MIN_PRODUCTS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Spec simulation needs sales for at least {SPEC_MODEL_MIN_PRODUCTS} products with full specs, "
+                   f"found {n_products}"
+        )
+    # Rows carry their own specs, so the job needs no product document
+    return submit_training(SPEC_MODEL, None, rows)
+
+async def get_spec_model():
+    """Regressor trained across the catalog, the only place specs vary, for spec sweeps
+
+    Per-product models see a single spec vector and predict the same sales for any
+    specs. A stale catalog model keeps serving while its refresh trains.
+    """
+    entry = await model_cache.aget(SPEC_MODEL)
+    if entry is not None:
+        trained_at = datetime.fromisoformat(entry[1]["trained_at"])
+        if (datetime.now() - trained_at).total_seconds() > SPEC_MODEL_MAX_AGE:
+            await train_spec_model()
+        return entry
+    job = await train_spec_model()
+    try:
+        await training_jobs.wait(job["id"])
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    entry = await model_cache.aget(SPEC_MODEL)
+    if entry is None:
+        raise HTTPException(status_code=503, detail=f"Training job {job['id']} finished without a catalog spec model")
+    return entry
+
+async def time_series_component(model_name):
+    """Smoothing forecast of a product's sales history, refitted only after new sales arrive"""
+    component = forecast_components.get(model_name, "time_series")
+    if component is None:
+        with stage("mongo_fetch"):
+            sales_data = await async_sales_collection.find(
+                {"model": model_name}, {"_id": 0, "model": 1, "month": 1, "units_sold": 1}
+            )
+        with stage("time_series_fit"):
+            component = await asyncio.to_thread(forecast_series, sales_data, MAX_FORECAST_PERIODS)
+        forecast_components.set(model_name, "time_series", component)
+    return component
+
+def regression_component(model_name, trained, metadata, features):
+    """Regression estimate for the product's specs, reused until the model or specs change"""
+    fingerprint = (metadata["version"], tuple(features))
+    prediction = forecast_components.get(model_name, "regression", fingerprint)
+    if prediction is None:
+        prediction = forecast_components.set(
+            model_name, "regression", float(trained.predict_sales(features)), fingerprint
+        )
+    return prediction
 
 @app.get("/")
 async def root():
@@ -54,7 +211,8 @@ async def health_check():
 @app.post("/add-product")
 async def add_product(product: Product):
     try:
-        result = smartphones_collection.insert_one(product.dict())
+        result = await async_smartphones_collection.insert_one(product.dict())
+        response_cache.invalidate(f"model:{product.model}", "models")
         return {"message": "Product added successfully", "id": str(result.inserted_id)}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -62,72 +220,282 @@ async def add_product(product: Product):
 @app.post("/add-sales")
 async def add_sales(sales: SalesData):
     try:
-        result = sales_collection.insert_one(sales.dict())
+        document = sales.dict()
+        result = await async_sales_collection.insert_one(document)
+        await run_db(record_sales_write, [document])
+        response_cache.invalidate("dashboard", f"model:{sales.model}")
+        forecast_components.invalidate(sales.model, "time_series")
+        invalidate_chat_context()
         return {"message": "Sales data added successfully", "id": str(result.inserted_id)}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/predict/{model_name}")
-async def predict_sales(model_name: str):
+@app.post("/add-product/bulk")
+async def add_products_bulk(request: Request, upsert: bool = False, batch_size: int = 1000):
     try:
-        # Get product data
-        product = smartphones_collection.find_one({"model": model_name})
-        if not product:
-            raise HTTPException(status_code=404, detail="Product not found")
+        summary = await bulk_ingest(request, PRODUCT_ADAPTER, smartphones_collection, PRODUCT_KEY, upsert, max(1, batch_size))
+        response_cache.invalidate("models")
+        return summary
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/add-sales/bulk")
+async def add_sales_bulk(request: Request, upsert: bool = False, batch_size: int = 1000):
+    try:
+        summary = await bulk_ingest(request, SALES_ADAPTER, sales_collection, SALES_KEY, upsert, max(1, batch_size),
+                                    on_write=record_sales_write)
+        response_cache.invalidate("dashboard", "models")
+        forecast_components.invalidate(component="time_series")
+        invalidate_chat_context()
+        return summary
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def run_import_job(job, path, chunksize, cleanup):
+    def report(summary):
+        job.update(summary, status="running")
+    try:
+        job.update(import_smartphones_csv(path, smartphones_collection, chunksize, report), status="completed")
+    except Exception as e:
+        job.update(status="failed", error=str(e))
+    finally:
+        job["finished_at"] = datetime.now()
+        response_cache.invalidate("models")
+        if cleanup:
+            os.remove(path)
+
+@app.post("/import/smartphones-csv")
+async def import_smartphones(request: Request, chunksize: int = 10000):
+    """Import an uploaded CSV body, or data/sales.csv when the body is empty"""
+    path, cleanup = DEFAULT_CSV_PATH, False
+    upload = None
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        if upload is None:
+            # Spool to disk so uploads larger than memory are never held whole
+            upload = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+        upload.write(chunk)
+    if upload is not None:
+        upload.close()
+        path, cleanup = upload.name, True
+    
+    job_id = uuid.uuid4().hex
+    job = {"id": job_id, "status": "queued", "progress": 0.0, "submitted_at": datetime.now(), "error": None}
+    import_jobs[job_id] = job
+    job["task"] = asyncio.create_task(asyncio.to_thread(run_import_job, job, path, max(1, chunksize), cleanup))
+    return {k: v for k, v in job.items() if k != "task"}
+
+@app.get("/import/{job_id}")
+async def get_import_job(job_id: str):
+    job = import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return {k: v for k, v in job.items() if k != "task"}
+
+@app.post("/predict/batch")
+async def predict_batch(request: BatchPredictionRequest):
+    """Score raw feature rows against one model, or many products against their own models
+
+    Each product has its own fitted model, so scoring a list of products is still one
+    predict call per product; the saving over N calls to /predict is the single catalog
+    query, concurrent model loads and one insert for all predictions. Raw feature rows
+    share one model and are scored in a single vectorised call.
+    """
+    try:
+        # Raw spec vectors are scored against one product's model
+        if request.features is not None:
+            if not request.model_name:
+                raise HTTPException(status_code=400, detail="model_name is required when scoring raw features")
+            trained, metadata = await get_trained_model(request.model_name)
+            predictions = trained.hybrid_prediction_batch(request.features)
+            return {
+                "model": request.model_name,
+                "model_version": metadata["version"],
+                "predicted_sales": predictions.tolist()
+            }
         
-        # Get sales data for training
-        sales_data = list(sales_collection.find({"model": model_name}))
-        if not sales_data:
-            raise HTTPException(status_code=404, detail="Sales data not found")
+        if not request.model_names:
+            raise HTTPException(status_code=400, detail="Provide model_names or features")
         
-        # Prepare data for training
-        df = pd.DataFrame(sales_data)
+        # One round-trip for every requested product
+        names = list(dict.fromkeys(request.model_names))
+        products = {
+            p["model"]: p for p in await async_smartphones_collection.find({"model": {"$in": names}}, {"_id": 0})
+        }
+        not_found = [name for name in names if name not in products]
         
-        # Train models
-        metrics = ml_models.train_regression_models(df)
-        ml_models.train_prophet_model(df)
+        # A malformed product document is reported, not allowed to fail the whole batch
+        features = {}
+        invalid = []
+        for name in names:
+            if name in products:
+                try:
+                    features[name] = [float(value) for value in product_features(products[name])]
+                except (KeyError, TypeError, ValueError):
+                    invalid.append(name)
         
-        # Make prediction
-        features = [product['price'], product['ram'], product['storage'], 
-                   product['battery'], product['camera_mp']]
-        prediction = ml_models.hybrid_prediction(features)
+        entries = {}
+        untrained = []
+        found = [name for name in names if name in features]
+        for name, entry in zip(found, await asyncio.gather(*(model_cache.aget(name) for name in found))):
+            if entry is None:
+                untrained.append(name)
+            else:
+                entries[name] = entry
         
-        # Store prediction
-        prediction_data = {
-            "model": model_name,
-            "predicted_sales": float(prediction),
-            "confidence_score": 0.85,
-            "created_at": datetime.now()
-        }
-        predictions_collection.insert_one(prediction_data)
+        if untrained and request.train_missing:
+            results = await asyncio.gather(
+                *(get_trained_model(name) for name in untrained), return_exceptions=True
+            )
+            for name, result in zip(untrained, results):
+                if not isinstance(result, Exception):
+                    entries[name] = result
+            untrained = [name for name in untrained if name not in entries]
+        
+        scored = [name for name in names if name in entries]
+        X = np.array([features[name] for name in scored], dtype=float).reshape(len(scored), len(FEATURE_COLUMNS))
+        predictions = np.zeros(len(scored))
+        
+        # Group rows by estimator so each fitted model sees a single predict call
+        groups = {}
+        for i, name in enumerate(scored):
+            trained = entries[name][0]
+            groups.setdefault(id(trained), (trained, []))[1].append(i)
+        # Blend in next-month time-series forecasts that are already fitted; the rest
+        # are scored on regression alone rather than fetching every history here
+        next_month = np.full(len(scored), np.nan)
+        for i, name in enumerate(scored):
+            series = forecast_components.get(name, "time_series")
+            if series:
+                next_month[i] = series["forecast"][0]
+        for trained, rows in groups.values():
+            predictions[rows] = trained.hybrid_prediction_batch(X[rows], time_series_pred=next_month[rows])
+        
+        versions = [entries[name][1]["version"] for name in scored]
+        if scored:
+            created_at = datetime.now()
+            await async_predictions_collection.insert_many([
+                {
+                    "model": name,
+                    "predicted_sales": float(prediction),
+                    "confidence_score": 0.85,
+                    "model_version": version,
+                    "created_at": created_at
+                }
+                for name, prediction, version in zip(scored, predictions, versions)
+            ])
+            response_cache.invalidate("dashboard")
         
         return {
-            "model": model_name,
-            "predicted_sales": float(prediction),
-            "metrics": metrics,
-            "feature_importance": ml_models.feature_importance.to_dict('records') if ml_models.feature_importance is not None else []
+            "model": scored,
+            "predicted_sales": predictions.tolist(),
+            "model_version": versions,
+            "not_found": not_found,
+            "untrained": untrained,
+            "invalid": invalid
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/predict/{model_name}")
+async def predict_sales(request: Request, model_name: str, retrain: bool = False):
+    async def compute():
+        try:
+            # Get product data
+            with stage("mongo_fetch"):
+                product = await async_smartphones_collection.find_one({"model": model_name})
+            if not product:
+                raise HTTPException(status_code=404, detail="Product not found")
+            features = scoring_features(product)
+        
+            trained, metadata = await get_trained_model(model_name, retrain)
+        
+            # Make prediction
+            series = await time_series_component(model_name)
+            next_month = series["forecast"][0] if series else None
+            with stage("predict"):
+                prediction = trained.hybrid_prediction(features, time_series_pred=next_month)
+        
+            # Store prediction
+            prediction_data = {
+                "model": model_name,
+                "predicted_sales": float(prediction),
+                "confidence_score": 0.85,
+                "model_version": metadata["version"],
+                "created_at": datetime.now()
+            }
+            await async_predictions_collection.insert_one(prediction_data)
+            response_cache.invalidate("dashboard")
+        
+            return {
+                "model": model_name,
+                "predicted_sales": float(prediction),
+                "model_version": metadata["version"],
+                "data_hash": metadata["data_hash"],
+                "metrics": metadata["metrics"],
+                "feature_importance": trained.feature_importance.to_dict('records') if trained.feature_importance is not None else []
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    # Retrains bypass the cache and replace the stored response
+    return await response_cache.respond(
+        request, [f"model:{model_name}", "models"], compute, refresh=retrain, ignore=("retrain",)
+    )
+
+@app.post("/train/{model_name}")
+async def train_model(model_name: str, full: bool = False):
+    product, sales_data = await fetch_training_data(model_name)
+    return submit_training(model_name, product, sales_data, incremental=not full)
+
+@app.post("/tune/{model_name}")
+async def tune_model(model_name: str, budget: float = TUNE_BUDGET):
+    """Queue a hyperparameter search (budget in seconds) followed by a full retrain"""
+    if not 0 < budget <= MAX_TUNE_BUDGET:
+        raise HTTPException(status_code=400, detail=f"budget must be between 0 and {MAX_TUNE_BUDGET:.0f} seconds")
+    product, sales_data = await fetch_training_data(model_name)
+    return submit_training(model_name, product, sales_data, tune_budget=budget)
+
+@app.get("/jobs")
+async def list_jobs():
+    return training_jobs.list()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/cache/models")
+async def model_cache_stats():
+    return model_cache.stats()
+
 @app.post("/simulate")
 async def simulate(simulation: SimulationRequest):
     try:
         # Get base product data
-        product = smartphones_collection.find_one({"model": simulation.model_name})
+        product = await async_smartphones_collection.find_one({"model": simulation.model_name})
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
+        original_features = scoring_features(product)
         
-        # Use simulated values
-        features = [simulation.price, simulation.ram, simulation.battery, 
-                   product['storage'], simulation.camera_mp]
+        trained, _ = await get_trained_model(simulation.model_name)
+        spec_model, spec_metadata = await get_spec_model()
         
-        # Get original prediction
-        original_features = [product['price'], product['ram'], product['battery'], 
-                           product['storage'], product['camera_mp']]
+        # Use simulated values
+        features = [simulation.price, simulation.ram, product['storage'],
+                   simulation.battery, simulation.camera_mp]
         
-        original_sales = ml_models.predict_sales(original_features)
-        simulated_sales = ml_models.predict_sales(features)
+        # The product's own level, moved by the effect the catalog model attributes to the spec change
+        original_sales = trained.predict_sales(original_features)
+        spec_effect = spec_model.predict_sales(features) - spec_model.predict_sales(original_features)
+        simulated_sales = max(0.0, original_sales + spec_effect)
         
         # Calculate impact
         percent_change = ((simulated_sales - original_sales) / original_sales) * 100
@@ -137,77 +505,374 @@ async def simulate(simulation: SimulationRequest):
             "original_sales": float(original_sales),
             "simulated_sales": float(simulated_sales),
             "percent_change": float(percent_change),
-            "revenue_impact": float(revenue_impact)
+            "revenue_impact": float(revenue_impact),
+            "spec_model_version": spec_metadata["version"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def resolve_feature_range(feature_range, default):
+    if feature_range is None:
+        return np.array([default], dtype=float)
+    if feature_range.values:
+        return np.array(feature_range.values, dtype=float)
+    if feature_range.start is None:
+        return np.array([default], dtype=float)
+    if feature_range.stop is None or not feature_range.step:
+        return np.array([feature_range.start], dtype=float)
+    # Inclusive of stop, tolerant to float rounding
+    return np.arange(feature_range.start, feature_range.stop + feature_range.step / 2, feature_range.step)
+
+@app.post("/simulate/grid")
+async def simulate_grid(simulation: GridSimulationRequest):
+    try:
+        product = await async_smartphones_collection.find_one({"model": simulation.model_name})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        original_features = scoring_features(product)
+        axes = [
+            resolve_feature_range(getattr(simulation, feature), value)
+            for feature, value in zip(FEATURE_COLUMNS, original_features)
+        ]
+        shape = [len(values) for values in axes]
+        total = int(np.prod(shape))
+        if total == 0:
+            raise HTTPException(status_code=400, detail="Every feature range needs at least one value")
+        if total > MAX_GRID_POINTS:
+            raise HTTPException(status_code=400, detail=f"Grid has {total} points, limit is {MAX_GRID_POINTS}")
+        
+        trained, _ = await get_trained_model(simulation.model_name)
+        spec_model, spec_metadata = await get_spec_model()
+        
+        # Same composition as /simulate: product level plus the catalog model's spec effect
+        original_sales = trained.predict_sales(original_features)
+        grid_sales = await asyncio.to_thread(spec_model.predict_grid, axes, simulation.chunk_size)
+        simulated_sales = np.maximum(0.0, original_sales + grid_sales - spec_model.predict_sales(original_features))
+        
+        # Columnar result: axis values plus predictions flattened in C order over `shape`
+        return {
+            "features": FEATURE_COLUMNS,
+            "axes": {feature: values.tolist() for feature, values in zip(FEATURE_COLUMNS, axes)},
+            "shape": shape,
+            "original_sales": float(original_sales),
+            "simulated_sales": simulated_sales.tolist(),
+            "spec_model_version": spec_metadata["version"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/forecast/catalog")
+async def get_catalog_forecast(periods: int = 6):
+    if not 1 <= periods <= 36:
+        raise HTTPException(status_code=400, detail="periods must be between 1 and 36")
+    try:
+        sales_data = await async_sales_collection.find(
+            projection={"_id": 0, "model": 1, "month": 1, "units_sold": 1}
+        )
+        result = await asyncio.to_thread(forecast_catalog, sales_data, periods)
+        return {
+            "models": result["models"],
+            "months": result["months"],
+            "forecast": result["forecast"].tolist(),
+            "lower": result["lower"].tolist(),
+            "upper": result["upper"].tolist()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/forecast/hierarchy")
+async def get_hierarchical_forecast(request: Request, periods: int = 6, method: str = "mint"):
+    """Total, brand and model forecasts reconciled so every level adds up"""
+    if not 1 <= periods <= 36:
+        raise HTTPException(status_code=400, detail="periods must be between 1 and 36")
+    if method not in ("mint", "bottom_up"):
+        raise HTTPException(status_code=400, detail="method must be 'mint' or 'bottom_up'")
+    
+    async def compute():
+        try:
+            sales_data, products = await asyncio.gather(
+                async_sales_collection.find(projection={"_id": 0, "model": 1, "month": 1, "units_sold": 1}),
+                async_smartphones_collection.find(projection={"_id": 0, "model": 1, "brand": 1})
+            )
+            brand_by_model = {p["model"]: p.get("brand") for p in products}
+            result = await asyncio.to_thread(forecast_hierarchy, sales_data, brand_by_model, periods, method)
+            return {
+                "method": method,
+                "months": result["months"],
+                "levels": result["levels"],
+                "names": result["names"],
+                "brands": result["brands"],
+                "forecast": result["forecast"].tolist(),
+                "base": result["base"].tolist()
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    return await response_cache.respond(request, ["models", "dashboard"], compute)
+
+@app.get("/forecast/{model_name}")
+async def get_forecast(request: Request, model_name: str, periods: int = 6):
+    """Monthly forecast blending the product's time-series component with its regression model"""
+    if not 1 <= periods <= MAX_FORECAST_PERIODS:
+        raise HTTPException(status_code=400, detail=f"periods must be between 1 and {MAX_FORECAST_PERIODS}")
+    
+    async def compute():
+        try:
+            product = await async_smartphones_collection.find_one({"model": model_name}, {"_id": 0})
+            if not product:
+                raise HTTPException(status_code=404, detail="Product not found")
+            features = scoring_features(product)
+            series = await time_series_component(model_name)
+            if series is None:
+                raise HTTPException(status_code=404, detail="Sales data not found")
+            
+            # Both components come from cache after the first call, so changing the
+            # horizon only slices the stored forecasts
+            trained, metadata = await get_trained_model(model_name)
+            regression = regression_component(model_name, trained, metadata, features)
+            
+            horizon = slice(0, periods)
+            return {
+                "model": model_name,
+                "months": series["months"][horizon],
+                "forecast": blend_forecasts(regression, series["forecast"][horizon]).tolist(),
+                "lower": blend_forecasts(regression, series["lower"][horizon]).tolist(),
+                "upper": blend_forecasts(regression, series["upper"][horizon]).tolist(),
+                "components": {
+                    "regression": regression,
+                    "time_series": series["forecast"][horizon]
+                },
+                "model_version": metadata["version"]
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    return await response_cache.respond(request, [f"model:{model_name}", "models"], compute)
+
+@app.get("/backtest")
+async def get_backtest(model: Optional[str] = None):
+    """Per-horizon errors from the latest backtest run covering `model` (whole catalog by default)"""
+    key = model or CATALOG_KEY
+    try:
+        latest = await async_backtest_results_collection.find(
+            {"model": key}, {"_id": 0, "run_id": 1}, sort=[("created_at", -1)], limit=1
+        )
+        if not latest:
+            raise HTTPException(status_code=404, detail="No backtest results found")
+        results = await async_backtest_results_collection.find(
+            {"model": key, "run_id": latest[0]["run_id"]}, {"_id": 0}
+        )
+        first = results[0]
+        return {
+            "model": model,
+            "run_id": first["run_id"],
+            "created_at": first["created_at"],
+            "horizon": first["horizon"],
+            "windows": first["windows"],
+            "methods": {result["method"]: result["horizons"] for result in results}
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/cache/forecasts")
+async def forecast_cache_stats():
+    return forecast_components.stats()
+
 @app.get("/feature-importance/{model_name}")
-async def get_feature_importance(model_name: str):
+async def get_feature_importance(request: Request, model_name: str, waterfalls: bool = False):
+    async def compute():
+        try:
+            # Explanations are written once per model version by the training job
+            importance_data = await async_feature_importance_collection.find(
+                {"model": model_name, "kind": "global"}, {"_id": 0}, sort=[("version", -1)], limit=1
+            )
+            if importance_data and waterfalls:
+                importance_data += await async_feature_importance_collection.find(
+                    {"model": model_name, "kind": "waterfall", "version": importance_data[0]["version"]},
+                    {"_id": 0}, sort=[("instance", 1)]
+                )
+            if importance_data:
+                return importance_data
+            else:
+                return {"message": "No feature importance data found"}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    return await response_cache.respond(request, [f"model:{model_name}", "models"], compute)
+
+@app.get("/feature-importance/{model_name}/approximate")
+async def get_approximate_feature_importance(model_name: str, max_rows: int = 2000,
+                                             time_budget: Optional[float] = None, algorithm: str = "auto"):
+    if algorithm not in ("auto", "interventional", "tree_path_dependent"):
+        raise HTTPException(status_code=400, detail="algorithm must be auto, interventional or tree_path_dependent")
     try:
-        importance_data = list(feature_importance_collection.find({"model": model_name}))
-        if importance_data:
-            return importance_data
-        else:
-            return {"message": "No feature importance data found"}
+        trained, metadata = await get_trained_model(model_name)
+        product, sales_data = await fetch_training_data(model_name)
+        X, _ = trained.prepare_feature_data(build_training_frame(product, sales_data))
+        
+        analyzer = ShapAnalyzer(trained.xgboost_model, FEATURE_COLUMNS, cache_key=(model_name, metadata["version"]))
+        await asyncio.to_thread(
+            analyzer.explain_budgeted, X, max(1, max_rows), time_budget, algorithm
+        )
+        return {
+            "model": model_name,
+            "version": metadata["version"],
+            "feature_importance": analyzer.get_feature_importance().to_dict('records'),
+            "constant_features": analyzer.constant_features(X),
+            "budget": analyzer.budget_report
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def load_chat_context():
+    # Reuses the maintained dashboard summary instead of aggregating sales_data
+    summary = await run_db(get_dashboard_summary)
+    feature_importance = await async_feature_importance_collection.find(
+        {"kind": "global"}, {"_id": 0, "model": 1, "version": 1, "feature_importance": 1},
+        sort=[("computed_at", -1)], limit=5
+    )
+    return {
+        "sales_summary": {
+            "total_sales": summary["total_units"],
+            "avg_sales": summary["avg_sales"],
+            "total_revenue": summary["total_revenue"]
+        },
+        "feature_importance": feature_importance
+    }
+
+chat_context = ContextSnapshot(load_chat_context, ttl=CHAT_CONTEXT_TTL)
+
+def invalidate_chat_context():
+    # Answers were grounded in the old summary, so they go too
+    chat_context.invalidate()
+    chat_cache.invalidate()
+
 @app.post("/chat")
 async def chat(request: ChatRequest):
     try:
-        # Get context from database
-        sales_summary = list(sales_collection.aggregate([
-            {"$group": {
-                "_id": None,
-                "total_sales": {"$sum": "$units_sold"},
-                "avg_sales": {"$avg": "$units_sold"},
-                "total_revenue": {"$sum": "$revenue"}
-            }}
-        ]))
-        
-        feature_importance = list(feature_importance_collection.find().limit(5))
+        # Get context from the cached snapshot
+        snapshot = await chat_context.get()
         
         context = {
-            "sales_summary": sales_summary[0] if sales_summary else {},
-            "feature_importance": feature_importance,
+            "sales_summary": snapshot["sales_summary"],
+            "feature_importance": snapshot["feature_importance"],
             "query_context": request.context
         }
         
-        response = chatbot.generate_response(request.query, context)
+        response = await chatbot.generate_response(request.query, context)
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(data, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Server-Sent Events: one `data` message per token chunk, then a `done` event
+
+    Any failure, including loading the business context, arrives as an `error` event.
+    """
+    async def events():
+        try:
+            snapshot = await chat_context.get()
+            context = {
+                "sales_summary": snapshot["sales_summary"],
+                "feature_importance": snapshot["feature_importance"],
+                "query_context": request.context
+            }
+            async for chunk in chatbot.stream_response(request.query, context):
+                yield sse_event({"token": chunk})
+            yield sse_event({}, event="done")
+        except asyncio.TimeoutError:
+            yield sse_event({"error": f"No answer within {chatbot.timeout:.0f}s"}, event="error")
+        except Exception as e:
+            yield sse_event({"error": str(e)}, event="error")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/cache/chat")
+async def chat_cache_stats():
+    return chat_cache.stats()
+
+@app.get("/sales-trend")
+async def get_sales_trend(request: Request, brand: Optional[str] = None, model: Optional[str] = None,
+                          start_month: Optional[str] = None, end_month: Optional[str] = None,
+                          after: Optional[str] = None, limit: int = 120):
+    async def compute():
+        try:
+            sales_trend, next_after = await run_db(
+                query_sales_trend, brand, model, start_month, end_month, after, limit
+            )
+            return {"sales_trend": sales_trend, "next_after": next_after}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    return await response_cache.respond(request, ["dashboard"], compute)
+
 @app.get("/dashboard-data")
-async def get_dashboard_data():
-    try:
-        # Get total sales
-        total_sales = sales_collection.aggregate([
-            {"$group": {"_id": None, "total": {"$sum": "$units_sold"}}}
-        ])
-        total_sales = list(total_sales)[0]['total'] if list(total_sales) else 0
-        
-        # Get total revenue
-        total_revenue = sales_collection.aggregate([
-            {"$group": {"_id": None, "total": {"$sum": "$revenue"}}}
-        ])
-        total_revenue = list(total_revenue)[0]['total'] if list(total_revenue) else 0
-        
-        # Get latest predictions
-        latest_predictions = list(predictions_collection.find().sort("created_at", -1).limit(5))
-        
-        # Get sales trend
-        sales_trend = list(sales_collection.find().sort("month", 1))
-        
-        return {
-            "total_sales": total_sales,
-            "total_revenue": total_revenue,
-            "latest_predictions": latest_predictions,
-            "sales_trend": sales_trend
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_dashboard_data(request: Request, brand: Optional[str] = None, model: Optional[str] = None,
+                             start_month: Optional[str] = None, end_month: Optional[str] = None,
+                             after: Optional[str] = None, limit: int = 120):
+    async def compute():
+        try:
+            # Totals are maintained incrementally on every sales write
+            summary = await run_db(get_dashboard_summary)
+            
+            # Get latest predictions
+            latest_predictions = await async_predictions_collection.find(
+                projection={"_id": 0}, sort=[("created_at", -1)], limit=5
+            )
+            
+            # Get sales trend, rolled up by month in Mongo
+            sales_trend, next_after = await run_db(
+                query_sales_trend, brand, model, start_month, end_month, after, limit
+            )
+            
+            return {
+                "total_sales": summary["total_units"],
+                "total_revenue": summary["total_revenue"],
+                "avg_sales": summary["avg_sales"],
+                "latest_predictions": latest_predictions,
+                "sales_trend": sales_trend,
+                "next_after": next_after
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    return await response_cache.respond(request, ["dashboard"], compute)
+
+@app.post("/dashboard-data/rebuild")
+async def rebuild_dashboard_data():
+    summary = await run_db(rebuild_dashboard_summary)
+    response_cache.invalidate("dashboard")
+    invalidate_chat_context()
+    return summary
+
+@app.get("/cache/responses")
+async def response_cache_stats():
+    return response_cache.stats()
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text exposition; rendering is cheap enough to stay on the event loop
+    return Response(metrics_registry.render(), media_type=CONTENT_TYPE)
 
 if __name__ == "__main__":
     import uvicorn
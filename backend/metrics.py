@@ -0,0 +1,240 @@
+"""Minimal in-process Prometheus metrics (text exposition format 0.0.4)
+
+Counters, gauges and histograms keep their samples in plain dicts guarded by one
+lock each, so an observation costs a dict lookup and a bisect. Values that already
+live elsewhere (cache statistics) are read through collectors at scrape time and
+cost nothing on the request path.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from starlette.routing import Match
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a cached response (ms) up to a cold training run or slow LLM answer
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def collect(self):
+        with self._lock:
+            samples = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in samples
+        ]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        # Non-cumulative counts per bucket (last slot is +Inf); cumulated at scrape time
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def collect(self):
+        with self._lock:
+            samples = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        lines = self.header()
+        for labels, counts, total in samples:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """collector() returns Metric objects built fresh at scrape time"""
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.collect())
+        for collector in self.collectors:
+            for metric in collector():
+                lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    "sales_api_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status")
+)
+REQUESTS_IN_PROGRESS = registry.gauge(
+    "sales_api_requests_in_progress", "HTTP requests currently being served", ("method",)
+)
+STAGE_SECONDS = registry.histogram(
+    "sales_api_stage_duration_seconds",
+    "Time spent in each prediction stage (mongo_fetch, dataframe_build, xgboost_fit, random_forest_fit, "
+    "time_series_fit, predict)",
+    ("stage",)
+)
+LLM_CALL_SECONDS = registry.histogram(
+    "sales_api_llm_call_duration_seconds", "Chat backend call duration by mode and outcome",
+    ("mode", "outcome")
+)
+
+@contextmanager
+def stage(name):
+    """Time a block as one STAGE_SECONDS observation"""
+    if not METRICS_ENABLED:
+        yield
+        return
+    with STAGE_SECONDS.time(name):
+        yield
+
+def observe_stages(timings):
+    """Record stage timings measured elsewhere (e.g. returned from a training worker)"""
+    if METRICS_ENABLED:
+        for name, seconds in (timings or {}).items():
+            STAGE_SECONDS.observe(seconds, name)
+
+def cache_collector(caches):
+    """Collector exposing hits/misses/hit ratio/entries for named objects with a stats() method"""
+    def collect():
+        hits = Counter("sales_api_cache_hits_total", "Cache hits since start", ("cache",))
+        misses = Counter("sales_api_cache_misses_total", "Cache misses since start", ("cache",))
+        ratio = Gauge("sales_api_cache_hit_ratio", "Cache hits / lookups since start", ("cache",))
+        entries = Gauge("sales_api_cache_entries", "Entries currently cached", ("cache",))
+        for name, cache in caches.items():
+            stats = cache.stats()
+            cache_hits = stats.get("hits", stats.get("exact_hits", 0) + stats.get("similar_hits", 0))
+            hits.inc(name, amount=cache_hits)
+            misses.inc(name, amount=stats.get("misses", 0))
+            ratio.set(stats.get("hit_ratio", 0.0), name)
+            entries.set(stats.get("entries", 0), name)
+        return [hits, misses, ratio, entries]
+    return collect
+
+def route_template(scope):
+    """Path template of the route that served the request; bounded label cardinality"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Older Starlette does not record the matched route in the scope
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request until its last body chunk is sent
+
+    Pure ASGI (not BaseHTTPMiddleware) so streamed responses such as /chat/stream
+    are timed to completion and no extra task is spawned per request.
+    """
+
+    def __init__(self, app, excluded_paths=("/metrics",)):
+        self.app = app
+        self.excluded_paths = set(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = [500]
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec(method)
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method, route_template(scope), str(status[0]))
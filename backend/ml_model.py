@@ -6,40 +6,139 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from datetime import datetime, timedelta
 import joblib
+import time
+from forecasting import exponential_smoothing_forecast
 import warnings
 warnings.filterwarnings('ignore')
 
+FEATURE_COLUMNS = ['price', 'ram', 'storage', 'battery', 'camera_mp']
+
+# Used when a product has no tuned configuration
+DEFAULT_PARAMS = {
+    'xgboost': {'n_estimators': 100, 'learning_rate': 0.1},
+    'random_forest': {'n_estimators': 100}
+}
+
+class MissingSpecsError(ValueError):
+    """A product document lacks specs the models are trained on"""
+
+def build_training_frame(product, sales_data):
+    """Join a product's specs onto each of its sales rows (rows that carry their own specs keep them)"""
+    df = pd.DataFrame(sales_data)
+    missing = [feature for feature in FEATURE_COLUMNS if feature not in df.columns]
+    if missing:
+        specs = dict(zip(FEATURE_COLUMNS, product_features(product)))
+        for feature in missing:
+            df[feature] = specs[feature]
+    if 'month' in df.columns:
+        df = df.sort_values('month').reset_index(drop=True)
+    return df
+
+def catalog_training_rows(products, sales_data):
+    """Sales rows of every product with full specs, each carrying its product's specs
+
+    A per-product model sees one spec vector on all its rows and cannot learn how
+    specs move sales; across the catalog the specs vary. Returns the rows and the
+    number of distinct products they cover.
+    """
+    specs = {}
+    for product in products:
+        try:
+            specs[product["model"]] = dict(zip(FEATURE_COLUMNS, product_features(product)))
+        except (KeyError, MissingSpecsError):
+            continue
+    rows = [
+        {"model": row["model"], "month": row["month"], "units_sold": row["units_sold"], **specs[row["model"]]}
+        for row in sales_data if row.get("model") in specs
+    ]
+    return rows, len({row["model"] for row in rows})
+
+def product_features(product):
+    missing = [feature for feature in FEATURE_COLUMNS if product.get(feature) is None]
+    if missing:
+        raise MissingSpecsError(f"Product '{product.get('model')}' has no {', '.join(missing)} and cannot be scored")
+    return [product[feature] for feature in FEATURE_COLUMNS]
+
+def blend_forecasts(regression_pred, time_series_pred, time_series_weight=0.3, regression_weight=0.7):
+    """Weighted mix of regression and time-series predictions, broadcasting either side"""
+    regression_pred = np.asarray(regression_pred, dtype=float)
+    if time_series_pred is None:
+        return regression_pred
+    time_series_pred = np.asarray(time_series_pred, dtype=float)
+    blended = regression_weight * regression_pred + time_series_weight * time_series_pred
+    return np.where(np.isnan(time_series_pred), regression_pred, blended)
+
+def grid_chunks(axes, chunk_size=50000):
+    """Yield the cartesian product of per-feature value arrays in bounded row blocks"""
+    shape = tuple(len(values) for values in axes)
+    total = int(np.prod(shape))
+    for start in range(0, total, chunk_size):
+        flat = np.arange(start, min(start + chunk_size, total))
+        index = np.unravel_index(flat, shape)
+        yield np.column_stack([np.asarray(values, dtype=float)[i] for values, i in zip(axes, index)])
+
 class MLModels:
     def __init__(self):
         self.xgboost_model = None
         self.random_forest_model = None
         self.feature_importance = None
+        self.trained_months = set()
+        self.n_train_rows = 0
+        self.rows_since_refit = 0
+        self.target_mean = 0.0
+        self.params = None
+        # Seconds spent in the last fit of each regressor, reported as stage metrics
+        self.stage_timings = {}
         
     def prepare_feature_data(self, df):
-        features = ['price', 'ram', 'storage', 'battery', 'camera_mp']
-        X = df[features]
+        X = df[FEATURE_COLUMNS]
         y = df['units_sold']
         return X, y
     
-    def train_regression_models(self, df):
+    def hyperparameters(self):
+        """Effective estimator settings: tuned values layered over DEFAULT_PARAMS"""
+        tuned = getattr(self, 'params', None) or {}
+        return {kind: {**defaults, **tuned.get(kind, {})} for kind, defaults in DEFAULT_PARAMS.items()}
+    
+    def train_regression_models(self, df, params=None):
+        """Fit both regressors from scratch; params (e.g. from tuning.tune_models) are kept for later refits"""
+        if params is not None:
+            self.params = params
+        hyperparameters = self.hyperparameters()
         X, y = self.prepare_feature_data(df)
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
         # Train XGBoost
-        self.xgboost_model = XGBRegressor(n_estimators=100, learning_rate=0.1, random_state=42)
+        self.xgboost_model = XGBRegressor(**hyperparameters['xgboost'], random_state=42)
+        started = time.perf_counter()
         self.xgboost_model.fit(X_train, y_train)
+        xgboost_seconds = time.perf_counter() - started
         
         # Train Random Forest
-        self.random_forest_model = RandomForestRegressor(n_estimators=100, random_state=42)
+        self.random_forest_model = RandomForestRegressor(**hyperparameters['random_forest'], random_state=42)
+        started = time.perf_counter()
         self.random_forest_model.fit(X_train, y_train)
+        self.stage_timings = {'xgboost_fit': xgboost_seconds, 'random_forest_fit': time.perf_counter() - started}
         
         # Get feature importance
+        self.update_feature_importance()
+        
+        # Remember what the models have seen so later updates only train on new rows
+        self.trained_months = set(df['month']) if 'month' in df.columns else set()
+        self.n_train_rows = len(df)
+        self.rows_since_refit = 0
+        self.target_mean = float(y.mean())
+        
+        # Evaluate models
+        return self.evaluate(X_test, y_test)
+    
+    def update_feature_importance(self):
         self.feature_importance = pd.DataFrame({
-            'feature': X.columns,
+            'feature': FEATURE_COLUMNS,
             'importance': self.xgboost_model.feature_importances_
         })
-        
-        # Evaluate models
+    
+    def evaluate(self, X_test, y_test):
         xgb_pred = self.xgboost_model.predict(X_test)
         rf_pred = self.random_forest_model.predict(X_test)
         
@@ -58,31 +157,82 @@ class MLModels:
         
         return metrics
     
-    def predict_sales(self, features, model_name='xgboost'):
+    def update_regression_models(self, df, max_new_fraction=0.5, drift_threshold=0.25,
+                                 incremental_rounds=20, extra_trees=10):
+        """Continue training on months not seen yet, refitting from scratch past a row-count or drift threshold
+        
+        Returns (metrics, mode) where mode is 'full', 'incremental' or 'unchanged'.
+        """
+        trained_months = getattr(self, 'trained_months', None)
+        if self.xgboost_model is None or not trained_months or 'month' not in df.columns:
+            return self.train_regression_models(df), 'full'
+        
+        new_df = df[~df['month'].isin(trained_months)]
+        if new_df.empty:
+            return None, 'unchanged'
+        
+        X_new, y_new = self.prepare_feature_data(new_df)
+        rows_since_refit = self.rows_since_refit + len(new_df)
+        drift = abs(float(y_new.mean()) - self.target_mean) / max(abs(self.target_mean), 1.0)
+        if rows_since_refit > max_new_fraction * self.n_train_rows or drift > drift_threshold:
+            return self.train_regression_models(df), 'full'
+        
+        # Score the unseen rows before learning from them
+        metrics = self.evaluate(X_new, y_new)
+        
+        # Continue boosting from the existing booster
+        booster = self.xgboost_model.get_booster()
+        self.xgboost_model.set_params(n_estimators=incremental_rounds)
+        started = time.perf_counter()
+        self.xgboost_model.fit(X_new, y_new, xgb_model=booster)
+        xgboost_seconds = time.perf_counter() - started
+        
+        # Grow extra trees on the new rows and keep the old ones
+        self.random_forest_model.set_params(
+            warm_start=True,
+            n_estimators=self.random_forest_model.n_estimators + extra_trees
+        )
+        started = time.perf_counter()
+        self.random_forest_model.fit(X_new, y_new)
+        self.stage_timings = {'xgboost_fit': xgboost_seconds, 'random_forest_fit': time.perf_counter() - started}
+        
+        self.update_feature_importance()
+        self.trained_months.update(new_df['month'])
+        self.rows_since_refit = rows_since_refit
+        
+        return metrics, 'incremental'
+    
+    def predict_batch(self, X, model_name='xgboost'):
+        """Score a 2-D matrix of feature rows with a single predict call"""
+        X = np.asarray(X, dtype=float).reshape(-1, len(FEATURE_COLUMNS))
         if model_name == 'xgboost' and self.xgboost_model:
-            return self.xgboost_model.predict([features])[0]
+            return self.xgboost_model.predict(X)
         elif model_name == 'random_forest' and self.random_forest_model:
-            return self.random_forest_model.predict([features])[0]
-        return 0
+            return self.random_forest_model.predict(X)
+        return np.zeros(len(X))
+    
+    def predict_grid(self, axes, chunk_size=50000, model_name='xgboost'):
+        """Score every combination of the given axes, ordered like np.ndindex"""
+        predictions = [self.predict_batch(X, model_name) for X in grid_chunks(axes, chunk_size)]
+        return np.concatenate(predictions) if predictions else np.zeros(0)
+    
+    def predict_sales(self, features, model_name='xgboost'):
+        return self.predict_batch([features], model_name)[0]
     
     def simple_time_series_forecast(self, df, periods=6):
-        """Simple time series forecast using moving average"""
+        """Damped-trend exponential smoothing forecast for a single product's history"""
         if len(df) > 0:
-            last_values = df['units_sold'].values[-3:]
-            avg = np.mean(last_values)
-            trend = np.polyfit(range(len(df)), df['units_sold'].values, 1)[0]
-            
-            forecasts = []
-            for i in range(periods):
-                next_val = avg + (trend * (i + 1))
-                forecasts.append(max(0, next_val))
-            
-            return forecasts
+            Y = df['units_sold'].to_numpy(dtype=float)[None, :]
+            return exponential_smoothing_forecast(Y, periods)["forecast"][0].tolist()
         return [0] * periods
     
-    def hybrid_prediction(self, features, time_series_weight=0.3, regression_weight=0.7):
-        regression_pred = self.predict_sales(features)
-        time_series_pred = regression_pred * 1.1  # Simple adjustment
-        
-        hybrid_pred = (regression_weight * regression_pred) + (time_series_weight * time_series_pred)
-        return hybrid_pred
\ No newline at end of file
+    def hybrid_prediction(self, features, time_series_weight=0.3, regression_weight=0.7, time_series_pred=None):
+        return self.hybrid_prediction_batch([features], time_series_weight, regression_weight, time_series_pred)[0]
+    
+    def hybrid_prediction_batch(self, X, time_series_weight=0.3, regression_weight=0.7, time_series_pred=None):
+        """Blend the regression estimate for each row with a time-series forecast for it
+
+        Rows without a time-series value (None or NaN) get the regression estimate alone.
+        """
+        regression_pred = self.predict_batch(X)
+        return blend_forecasts(regression_pred, time_series_pred, time_series_weight, regression_weight)
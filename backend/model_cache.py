@@ -0,0 +1,130 @@
+import asyncio
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+# Memory budget for fitted models kept warm in this process
+MODEL_CACHE_BYTES = int(os.getenv("MODEL_CACHE_BYTES", 512 * 1024 * 1024))
+
+def estimate_size(value):
+    """Approximate in-memory footprint by serialized size"""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+class ModelCache:
+    """Size-bounded LRU of (MLModels, metadata) entries keyed by product model name"""
+
+    def __init__(self, loader, max_bytes=MODEL_CACHE_BYTES):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        # Bumped by invalidate(); loads that started earlier must not re-insert what they read
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return None
+
+    def _load(self, key):
+        with self._lock:
+            generation = self._generations.get(key, 0)
+        value = self.loader(key)
+        if value is not None:
+            self.put(key, value, generation)
+        return value
+
+    def get(self, key):
+        # Load outside the lock so one slow disk read doesn't stall other lookups
+        value = self._lookup(key)
+        return value if value is not None else self._load(key)
+
+    async def aget(self, key):
+        """get() for async callers: the disk read and size estimate run in a worker thread
+
+        Concurrent misses for the same key share one load.
+        """
+        value = self._lookup(key)
+        if value is not None:
+            return value
+        with self._lock:
+            task = self._loading.get(key)
+            if task is None:
+                task = self._loading[key] = asyncio.ensure_future(asyncio.to_thread(self._load, key))
+                task.add_done_callback(lambda done, key=key: self._forget_load(key, done))
+        # shield: one cancelled request must not abort the load the others are waiting on
+        return await asyncio.shield(task)
+
+    def _forget_load(self, key, task):
+        with self._lock:
+            # invalidate() may already have replaced this load with a newer one
+            if self._loading.get(key) is task:
+                del self._loading[key]
+
+    def put(self, key, value, generation=None):
+        size = estimate_size(value[0])
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key, 0):
+                return False
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            # Later lookups start a fresh load instead of joining one that read the old version
+            self._loading.pop(key, None)
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.current_bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def warm(self, keys):
+        """Preload entries until the memory budget is full"""
+        loaded = 0
+        for key in keys:
+            if self.current_bytes >= self.max_bytes:
+                break
+            value = self.loader(key)
+            if value is not None and self.put(key, value):
+                loaded += 1
+        return loaded
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
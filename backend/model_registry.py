@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+import joblib
+import pandas as pd
+
+from ml_model import FEATURE_COLUMNS
+
+# Trained artifacts live next to the backend unless overridden
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models"))
+
+def data_hash(df):
+    """Stable fingerprint of the rows a model was trained on"""
+    columns = [c for c in FEATURE_COLUMNS + ['month', 'units_sold'] if c in df.columns]
+    frame = df[columns]
+    if 'month' in frame.columns:
+        frame = frame.sort_values('month')
+    hashed = pd.util.hash_pandas_object(frame, index=False).values
+    return hashlib.sha256(hashed.tobytes()).hexdigest()
+
+def _to_builtin(value):
+    if isinstance(value, dict):
+        return {k: _to_builtin(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(v) for v in value]
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+class ModelRegistry:
+    """Versioned on-disk store of trained MLModels, one directory per product"""
+
+    def __init__(self, root=MODEL_DIR):
+        self.root = root
+
+    def _slug(self, model_name):
+        return re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name).strip('_') or 'model'
+
+    def _model_dir(self, model_name):
+        # The slug alone collides ("Galaxy S20" / "Galaxy S20+"); the hash of the exact name keeps keys unique
+        digest = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.root, f"{self._slug(model_name)}-{digest}")
+
+    def versions(self, model_name):
+        path = self._model_dir(model_name)
+        if not os.path.isdir(path):
+            return []
+        found = []
+        for name in os.listdir(path):
+            match = re.fullmatch(r'v(\d+)\.json', name)
+            if match:
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    def save(self, model_name, ml_models, df, metrics, update_mode='full', tuning=None):
+        path = self._model_dir(model_name)
+        os.makedirs(path, exist_ok=True)
+        existing = self.versions(model_name)
+        version = existing[-1] + 1 if existing else 1
+
+        metadata = {
+            "model": model_name,
+            "version": version,
+            "data_hash": data_hash(df),
+            "n_rows": int(len(df)),
+            "features": list(FEATURE_COLUMNS),
+            "metrics": _to_builtin(metrics),
+            "update_mode": update_mode,
+            "params": _to_builtin(ml_models.hyperparameters()),
+            "tuning": _to_builtin(tuning),
+            "trained_at": datetime.now().isoformat(),
+        }
+        # Write the artifact first so a metadata file always points at a complete model
+        joblib.dump(ml_models, os.path.join(path, f"v{version}.joblib"))
+        with open(os.path.join(path, f"v{version}.json"), "w") as f:
+            json.dump(metadata, f, indent=2)
+        return metadata
+
+    def metadata(self, model_name, version=None):
+        """Metadata of a stored version (latest by default) without loading the artifact"""
+        if version is None:
+            existing = self.versions(model_name)
+            if not existing:
+                return None
+            version = existing[-1]
+        with open(os.path.join(self._model_dir(model_name), f"v{version}.json")) as f:
+            return json.load(f)
+
+    def load(self, model_name, version=None):
+        metadata = self.metadata(model_name, version)
+        if metadata is None or metadata.get("model") != model_name:
+            return None
+        ml_models = joblib.load(os.path.join(self._model_dir(model_name), f"v{metadata['version']}.joblib"))
+        return ml_models, metadata
+
+    def model_names(self):
+        """Names of every product with at least one stored version"""
+        if not os.path.isdir(self.root):
+            return []
+        names = []
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            metadata_files = sorted(
+                (f for f in os.listdir(path) if re.fullmatch(r'v\d+\.json', f)),
+                key=lambda f: int(f[1:-5])
+            )
+            if not metadata_files:
+                continue
+            with open(os.path.join(path, metadata_files[-1])) as f:
+                names.append(json.load(f)["model"])
+        return names
@@ -1,7 +1,14 @@
-from pydantic import BaseModel
+import os
+from pydantic import BaseModel, Field, conlist
 from datetime import datetime
 from typing import Optional, List
 
+from database import CATALOG_CURRENCY
+from ml_model import FEATURE_COLUMNS
+
+# Largest row block /simulate/grid materialises at once
+MAX_GRID_CHUNK = int(os.getenv("MAX_GRID_CHUNK", 100000))
+
 class Product(BaseModel):
     brand: str
     model: str
@@ -12,6 +19,8 @@ class Product(BaseModel):
     camera_mp: int
     os: str
     launch_date: str
+    # Prices in another currency would skew every cross-product model
+    currency: str = Field(default=CATALOG_CURRENCY, pattern=f"^{CATALOG_CURRENCY}$")
 
 class SalesData(BaseModel):
     model: str
@@ -28,6 +37,28 @@ class SimulationRequest(BaseModel):
     camera_mp: int
     battery: int
 
+class BatchPredictionRequest(BaseModel):
+    model_names: Optional[List[str]] = None
+    # One value per FEATURE_COLUMNS entry, in that order
+    features: Optional[List[conlist(float, min_length=len(FEATURE_COLUMNS), max_length=len(FEATURE_COLUMNS))]] = None
+    model_name: Optional[str] = None
+    train_missing: bool = True
+
+class FeatureRange(BaseModel):
+    values: Optional[List[float]] = None
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    step: Optional[float] = None
+
+class GridSimulationRequest(BaseModel):
+    model_name: str
+    price: Optional[FeatureRange] = None
+    ram: Optional[FeatureRange] = None
+    storage: Optional[FeatureRange] = None
+    battery: Optional[FeatureRange] = None
+    camera_mp: Optional[FeatureRange] = None
+    chunk_size: int = Field(default=50000, ge=1, le=MAX_GRID_CHUNK)
+
 class ChatRequest(BaseModel):
     query: str
     context: Optional[dict] = None
\ No newline at end of file
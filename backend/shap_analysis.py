@@ -1,5 +1,9 @@
 import numpy as np
 import pandas as pd
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -18,31 +22,179 @@ except ImportError as e:
         class Explanation:
             pass
 
+import time
+
+SHAP_BATCH_SIZE = int(os.getenv("SHAP_BATCH_SIZE", 1024))
+EXPLAINER_CACHE_SIZE = int(os.getenv("EXPLAINER_CACHE_SIZE", 64))
+# Above this many rows explanations are computed on a stratified sample
+SHAP_EXACT_MAX_ROWS = int(os.getenv("SHAP_EXACT_MAX_ROWS", 5000))
+# Interventional cost grows with rows x background size; beyond this use path-dependent
+INTERVENTIONAL_MAX_EVALS = int(os.getenv("INTERVENTIONAL_MAX_EVALS", 200000))
+
+# Explainers keyed by (model name, version); building one walks every tree
+_explainers = OrderedDict()
+_explainers_lock = threading.Lock()
+
+def get_explainer(model, cache_key=None):
+    if cache_key is None:
+        return shap.TreeExplainer(model)
+    with _explainers_lock:
+        if cache_key in _explainers:
+            _explainers.move_to_end(cache_key)
+            return _explainers[cache_key]
+    explainer = shap.TreeExplainer(model)
+    with _explainers_lock:
+        _explainers[cache_key] = explainer
+        while len(_explainers) > EXPLAINER_CACHE_SIZE:
+            _explainers.popitem(last=False)
+    return explainer
+
+def stratified_sample(values, n, n_strata=10, random_state=42):
+    """Indices of an n-row sample spread proportionally across quantile strata of values"""
+    values = np.asarray(values)
+    if n >= len(values):
+        return np.arange(len(values))
+    rng = np.random.default_rng(random_state)
+    order = np.argsort(values, kind="stable")
+    strata = [s for s in np.array_split(order, min(n_strata, n)) if len(s)]
+    sizes = np.floor(n * np.array([len(s) for s in strata]) / len(values)).astype(int)
+    # Hand rows lost to rounding to the largest strata first
+    for i in np.argsort([-len(s) for s in strata])[:n - sizes.sum()]:
+        sizes[i] += 1
+    picked = [rng.choice(s, size=min(k, len(s)), replace=False) for s, k in zip(strata, sizes)]
+    return np.sort(np.concatenate(picked))
+
 class ShapAnalyzer:
-    def __init__(self, model, feature_names):
+    def __init__(self, model, feature_names, cache_key=None):
         self.model = model
         self.feature_names = feature_names
+        self.cache_key = cache_key
         self.explainer = None
         self.shap_values = None
+        self.row_index = None
+        self.importance_error = None
+        self.budget_report = None
         self.shap_available = SHAP_AVAILABLE
         
-    def explain(self, X):
+    def explain(self, X, batch_size=SHAP_BATCH_SIZE):
         if not self.shap_available:
             print("SHAP not available - using simplified analysis")
             return None
             
         try:
-            # Create explainer
-            self.explainer = shap.TreeExplainer(self.model)
+            # Reuse the explainer for this model version
+            self.explainer = get_explainer(self.model, self.cache_key)
+            
+            # Calculate SHAP values in row batches to bound peak memory
+            X = np.asarray(X, dtype=float)
+            batches = [
+                self.explainer.shap_values(X[start:start + batch_size])
+                for start in range(0, len(X), batch_size)
+            ]
+            self.shap_values = np.vstack(batches) if batches else np.zeros((0, len(self.feature_names)))
+            self.row_index = None
+            self.importance_error = None
+            
+            return self.shap_values
+        except Exception as e:
+            print(f"SHAP explanation error: {e}")
+            return None
+    
+    def explain_budgeted(self, X, max_rows=SHAP_EXACT_MAX_ROWS, time_budget=None, algorithm="auto",
+                         background_size=100, batch_size=SHAP_BATCH_SIZE, random_state=42):
+        """Approximate SHAP within a row and/or wall-clock budget
+        
+        Rows are drawn by stratified sampling over model predictions, the algorithm is
+        interventional (with a stratified background set) or path-dependent, and global
+        importances come with standard errors from the sample.
+        """
+        if not self.shap_available:
+            print("SHAP not available - using simplified analysis")
+            return None
+        
+        try:
+            started = time.perf_counter()
+            X = np.asarray(X, dtype=float)
+            n_total = len(X)
+            predictions = self.model.predict(X)
+            
+            n_rows = min(n_total, max_rows) if max_rows else n_total
+            if algorithm == "auto":
+                background = min(background_size, n_total)
+                algorithm = "interventional" if n_rows * background <= INTERVENTIONAL_MAX_EVALS else "tree_path_dependent"
+            
+            if algorithm == "interventional":
+                background_index = stratified_sample(predictions, background_size, random_state=random_state)
+                self.explainer = shap.TreeExplainer(
+                    self.model, data=X[background_index], feature_perturbation="interventional"
+                )
+            else:
+                background_index = []
+                self.explainer = get_explainer(self.model, self.cache_key)
+            
+            sample = stratified_sample(predictions, n_rows, random_state=random_state)
+            pilot = np.zeros(0, dtype=int)
+            batches = []
             
-            # Calculate SHAP values
-            self.shap_values = self.explainer.shap_values(X)
+            if time_budget is not None:
+                # Time a small stratified pilot batch and shrink the sample to what fits the remaining budget
+                pilot = sample[stratified_sample(predictions[sample], min(len(sample), 32), random_state=random_state)]
+                pilot_started = time.perf_counter()
+                batches.append(self.explainer.shap_values(X[pilot]))
+                per_row = (time.perf_counter() - pilot_started) / max(len(pilot), 1)
+                remaining = time_budget - (time.perf_counter() - started)
+                affordable = int(max(remaining, 0) * 0.9 / per_row) if per_row > 0 else len(sample)
+                if affordable < len(sample):
+                    sample = stratified_sample(predictions, max(affordable, len(pilot)), random_state=random_state)
             
+            # Pilot rows are already explained; they stay in the sample and count toward the estimate
+            rest = np.setdiff1d(sample, pilot)
+            for start in range(0, len(rest), batch_size):
+                rows = rest[start:start + batch_size]
+                batches.append(self.explainer.shap_values(X[rows]))
+            sample = np.concatenate([pilot, rest])
+            order = np.argsort(sample, kind="stable")
+            self.shap_values = np.vstack(batches)[order] if batches else np.zeros((0, len(self.feature_names)))
+            self.row_index = sample[order]
+            
+            # Standard error of mean |SHAP|; zero when every row was explained
+            abs_values = np.abs(self.shap_values)
+            n = len(abs_values)
+            finite_population = np.sqrt(max(n_total - n, 0) / max(n_total - 1, 1))
+            self.importance_error = (
+                abs_values.std(axis=0, ddof=1) / np.sqrt(n) * finite_population if n > 1 else np.zeros(abs_values.shape[1])
+            )
+            
+            self.budget_report = {
+                "algorithm": algorithm,
+                "n_rows_total": int(n_total),
+                "n_rows_explained": int(n),
+                "background_size": int(len(background_index)),
+                "max_rows": max_rows,
+                "time_budget": time_budget,
+                "elapsed_seconds": time.perf_counter() - started
+            }
             return self.shap_values
         except Exception as e:
             print(f"SHAP explanation error: {e}")
             return None
     
+    def constant_features(self, X):
+        """Features with a single value across X; SHAP attributes nothing to them
+
+        A per-product model is trained on one spec vector, so all of its features are constant.
+        """
+        X = np.asarray(X, dtype=float)
+        if len(X) == 0:
+            return []
+        return [name for name, column in zip(self.feature_names, X.T) if np.ptp(column) == 0]
+    
+    def expected_value(self):
+        expected_value = self.explainer.expected_value
+        if isinstance(expected_value, np.ndarray):
+            expected_value = expected_value[0]
+        return float(expected_value)
+    
     def get_feature_importance(self):
         if self.shap_values is not None:
             try:
@@ -50,23 +202,29 @@ class ShapAnalyzer:
                 feature_importance = pd.DataFrame({
                     'feature': self.feature_names,
                     'shap_value': importance
-                }).sort_values('shap_value', ascending=False)
-                return feature_importance
+                })
+                if self.importance_error is not None:
+                    # 95% interval from the sampling standard error
+                    feature_importance['std_error'] = self.importance_error
+                    feature_importance['ci_low'] = np.maximum(importance - 1.96 * self.importance_error, 0)
+                    feature_importance['ci_high'] = importance + 1.96 * self.importance_error
+                return feature_importance.sort_values('shap_value', ascending=False)
             except Exception as e:
                 print(f"Feature importance error: {e}")
                 
-        # Fallback to simple importance
+        # Fallback to the model's own impurity/gain importance
+        importance = getattr(self.model, 'feature_importances_', None)
+        if importance is None:
+            importance = np.zeros(len(self.feature_names))
         return pd.DataFrame({
             'feature': self.feature_names,
-            'shap_value': np.random.rand(len(self.feature_names)) * 0.1
+            'shap_value': np.asarray(importance, dtype=float)
         }).sort_values('shap_value', ascending=False)
     
     def get_waterfall_data(self, instance_idx=0):
         if self.shap_values is not None and self.explainer is not None:
             try:
-                expected_value = self.explainer.expected_value
-                if isinstance(expected_value, np.ndarray):
-                    expected_value = expected_value[0]
+                expected_value = self.expected_value()
                 
                 shap_values_instance = self.shap_values[instance_idx]
                 
@@ -79,9 +237,53 @@ class ShapAnalyzer:
             except Exception as e:
                 print(f"Waterfall data error: {e}")
         
-        # Return dummy data
+        # Nothing has been explained yet
         return {
-            'expected_value': 150000,
-            'shap_values': [10000, 5000, -3000, 2000, 1000],
+            'expected_value': None,
+            'shap_values': [],
             'features': self.feature_names
-        }
\ No newline at end of file
+        }
+    
+    def build_documents(self, model_name, version, X, months=None):
+        """Global importance plus one waterfall per row, ready for feature_importance_collection"""
+        computed_at = datetime.now()
+        importance = self.get_feature_importance()
+        constant = self.constant_features(X)
+        documents = [{
+            "model": model_name,
+            "version": version,
+            "kind": "global",
+            "method": "tree_shap" if self.shap_values is not None else "model_importance",
+            "expected_value": self.expected_value() if self.shap_values is not None else None,
+            "feature_importance": [
+                {k: (float(v) if k != 'feature' else v) for k, v in row.items()}
+                for row in importance.to_dict('records')
+            ],
+            "n_rows": int(len(X)),
+            "constant_features": constant,
+            "note": (
+                f"{', '.join(constant)} never vary in this model's training rows, so their importance is 0 "
+                "and says nothing about their effect on sales"
+            ) if constant else None,
+            "budget": self.budget_report,
+            "computed_at": computed_at
+        }]
+        if self.shap_values is not None:
+            expected_value = self.expected_value()
+            X = np.asarray(X, dtype=float)
+            rows = self.row_index if self.row_index is not None else np.arange(len(X))
+            for i, contributions in zip(rows, self.shap_values):
+                values = X[i]
+                documents.append({
+                    "model": model_name,
+                    "version": version,
+                    "kind": "waterfall",
+                    "instance": int(i),
+                    "month": months[i] if months is not None else None,
+                    "expected_value": expected_value,
+                    "features": list(self.feature_names),
+                    "feature_values": values.tolist(),
+                    "shap_values": contributions.tolist(),
+                    "computed_at": computed_at
+                })
+        return documents
\ No newline at end of file
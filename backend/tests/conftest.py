@@ -0,0 +1,57 @@
+"""API tests run against mongomock and train models in-process
+
+    pip install -r requirements-dev.txt
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("MODEL_DIR", tempfile.mkdtemp(prefix="models-"))
+os.environ["CHAT_BACKEND"] = "stub"
+
+mongomock = pytest.importorskip("mongomock")
+import pymongo
+
+# database.py builds its client at import time
+pymongo.MongoClient = mongomock.MongoClient
+
+@pytest.fixture
+def client(tmp_path):
+    from fastapi.testclient import TestClient
+    import database
+    import main
+
+    for name in database.db.list_collection_names():
+        database.db.drop_collection(name)
+    main.model_registry.root = str(tmp_path)
+    main.model_cache.clear()
+    main.response_cache.clear()
+    main.chat_cache.invalidate()
+    main.forecast_components.invalidate()
+    # Spawned workers would not see the in-memory database
+    main.training_jobs._executor = ThreadPoolExecutor(max_workers=1)
+    with TestClient(main.app) as test_client:
+        yield test_client
+    main.training_jobs.shutdown()
+
+def seed_sales(model_name, months=24, scale=1.0):
+    """Two years of monthly sales with a steady trend for one product, multiplied by scale"""
+    import database
+
+    database.sales_collection.insert_many([
+        {
+            "model": model_name,
+            "month": f"{2022 + t // 12}-{t % 12 + 1:02d}",
+            "units_sold": int(scale * (1000 + 30 * t + (t % 5) * 20)),
+            "revenue": 500.0 * (1000 + 30 * t),
+            "promotions": t % 6 == 0,
+            "competitor_launch": False
+        }
+        for t in range(months)
+    ])
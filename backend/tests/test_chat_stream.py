@@ -0,0 +1,17 @@
+def test_stream_ends_with_done_event(client):
+    response = client.post("/chat/stream", json={"query": "Which phone sells best?"})
+    assert response.status_code == 200
+    assert "data: {\"token\":" in response.text
+    assert response.text.rstrip().endswith("event: done\ndata: {}")
+
+def test_context_failure_is_an_error_event(client, monkeypatch):
+    import main
+
+    async def unavailable():
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(main.chat_context, "get", unavailable)
+    response = client.post("/chat/stream", json={"query": "Which phone sells best?"})
+    assert response.status_code == 200
+    assert "event: error" in response.text
+    assert "database unavailable" in response.text
@@ -0,0 +1,72 @@
+import time
+
+from conftest import seed_sales
+from csv_import import INR_PER_USD, SPEC_DEFAULTS
+
+CSV = """Brands,Models,Colors,Memory,Storage,Camera,Rating,Selling Price,Original Price,Mobile,Discount,discount percentage
+SAMSUNG,GALAXY M31S ,Mirage Black,8 GB,128 GB,Yes,4.3,19330,20999,SAMSUNG GALAXY M31S ,1669,7.9
+Nokia,3.2,Steel,2 GB,16 GB,Yes,3.8,10199,10199,Nokia 3.2,0,0.0
+Apple,iPhone 13,Blue,4 GB,128 GB,Yes,4.6,69900,79900,iPhone 13,10000,12.5
+"""
+
+def run_import(client):
+    job = client.post("/import/smartphones-csv", content=CSV.encode()).json()
+    for _ in range(200):
+        job = client.get(f"/import/{job['id']}").json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "completed", job
+    return job
+
+def test_imported_products_can_be_predicted(client):
+    run_import(client)
+    seed_sales("SAMSUNG GALAXY M31S")
+
+    response = client.get("/predict/SAMSUNG GALAXY M31S")
+    assert response.status_code == 200
+    assert response.json()["predicted_sales"] > 0
+
+    batch = client.post("/predict/batch", json={"model_names": ["SAMSUNG GALAXY M31S", "Nokia 3.2"]}).json()
+    assert batch["model"] == ["SAMSUNG GALAXY M31S"]
+    assert batch["invalid"] == []
+    # Nokia has specs but no sales history to train on
+    assert batch["untrained"] == ["Nokia 3.2"]
+
+def test_import_fills_missing_specs_only_for_new_products(client):
+    run_import(client)
+    import database
+
+    imported = database.smartphones_collection.find_one({"model": "Nokia 3.2"})
+    assert {spec: imported[spec] for spec in SPEC_DEFAULTS} == SPEC_DEFAULTS
+    assert imported["imputed_specs"] == sorted(SPEC_DEFAULTS)
+
+    # The seeded iPhone 13 keeps its real battery and camera
+    existing = database.smartphones_collection.find_one({"model": "iPhone 13"})
+    assert existing["battery"] == 3240
+    assert existing["camera_mp"] == 12
+    assert "imputed_specs" not in existing
+
+def test_product_without_specs_is_a_client_error(client):
+    import database
+
+    database.smartphones_collection.insert_one({"brand": "Acme", "model": "Acme One", "price": 199})
+    seed_sales("Acme One")
+    response = client.get("/predict/Acme One")
+    assert response.status_code == 422
+    assert "battery" in response.json()["detail"]
+
+def test_import_converts_prices_without_replacing_catalog_prices(client):
+    run_import(client)
+    import database
+
+    imported = database.smartphones_collection.find_one({"model": "Nokia 3.2"})
+    assert imported["price_inr"] == 10199
+    assert imported["price"] == round(10199 / INR_PER_USD, 2)
+    assert imported["currency"] == "USD"
+
+    # The seeded iPhone 13 keeps its USD price; the listing is stored beside it
+    existing = database.smartphones_collection.find_one({"model": "iPhone 13"})
+    assert existing["price"] == 799
+    assert existing["currency"] == "USD"
+    assert existing["price_inr"] == 69900
@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+from model_cache import ModelCache
+
+def test_invalidate_during_load_does_not_restore_the_old_version():
+    versions = {"P": 1}
+    reading = threading.Event()
+    release = threading.Event()
+
+    def loader(key):
+        version = versions[key]
+        reading.set()
+        release.wait(5)
+        return {"model": key}, {"version": version}
+
+    cache = ModelCache(loader)
+
+    async def scenario():
+        stale = asyncio.ensure_future(cache.aget("P"))
+        await asyncio.to_thread(reading.wait, 5)
+        # A retrain finishes while the old version is still being read
+        versions["P"] = 2
+        reading.clear()
+        cache.invalidate("P")
+        fresh = asyncio.ensure_future(cache.aget("P"))
+        release.set()
+        return await stale, await fresh
+
+    stale, fresh = asyncio.run(scenario())
+    assert stale[1]["version"] == 1
+    assert fresh[1]["version"] == 2
+    assert cache.get("P")[1]["version"] == 2
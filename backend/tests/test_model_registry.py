@@ -0,0 +1,16 @@
+import pandas as pd
+
+from ml_model import MLModels
+from model_registry import ModelRegistry
+
+def test_similar_names_get_separate_registry_entries(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    df = pd.DataFrame({"month": ["2024-01", "2024-02"], "units_sold": [1, 2], "price": 1.0, "ram": 1,
+                       "storage": 1, "battery": 1, "camera_mp": 1})
+    for name in ("SAMSUNG Galaxy S20", "SAMSUNG Galaxy S20+", "SAMSUNG Galaxy S20+"):
+        registry.save(name, MLModels(), df, metrics={})
+
+    assert registry.versions("SAMSUNG Galaxy S20") == [1]
+    assert registry.versions("SAMSUNG Galaxy S20+") == [1, 2]
+    assert registry.metadata("SAMSUNG Galaxy S20")["model"] == "SAMSUNG Galaxy S20"
+    assert sorted(registry.model_names()) == ["SAMSUNG Galaxy S20", "SAMSUNG Galaxy S20+"]
@@ -0,0 +1,16 @@
+from conftest import seed_sales
+
+def test_explicit_retrain_refits_a_new_version(client):
+    seed_sales("iPhone 13")
+    first = client.get("/predict/iPhone 13")
+    assert first.status_code == 200
+    assert first.json()["model_version"] == 1
+
+    # No unseen months: an incremental update would leave version 1 in place
+    retrained = client.get("/predict/iPhone 13", params={"retrain": True})
+    assert retrained.status_code == 200
+    assert retrained.json()["model_version"] == 2
+
+def test_batch_rejects_feature_rows_of_the_wrong_length(client):
+    response = client.post("/predict/batch", json={"model_name": "iPhone 13", "features": [[1, 2, 3]]})
+    assert response.status_code == 422
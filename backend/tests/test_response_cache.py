@@ -0,0 +1,14 @@
+from conftest import seed_sales
+
+def test_added_product_shows_up_in_cached_hierarchy(client):
+    seed_sales("iPhone 13")
+    before = client.get("/forecast/hierarchy", params={"periods": 2}).json()
+    assert "Acme One" not in before["names"]
+
+    product = {"brand": "Acme", "model": "Acme One", "price": 199, "ram": 4, "storage": 64,
+               "battery": 4000, "camera_mp": 12, "os": "Android", "launch_date": "2024-01-01"}
+    assert client.post("/add-product", json=product).status_code == 200
+    seed_sales("Acme One")
+
+    after = client.get("/forecast/hierarchy", params={"periods": 2}).json()
+    assert "Acme One" in after["names"]
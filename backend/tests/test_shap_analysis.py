@@ -0,0 +1,48 @@
+import numpy as np
+
+import shap_analysis
+from ml_model import FEATURE_COLUMNS
+from shap_analysis import ShapAnalyzer
+
+class SumModel:
+    def predict(self, X):
+        return np.asarray(X).sum(axis=1)
+
+class CountingExplainer:
+    """Stands in for TreeExplainer: contributions equal the inputs, rows are counted"""
+    expected_value = 0.0
+
+    def __init__(self):
+        self.rows = 0
+
+    def shap_values(self, X):
+        self.rows += len(X)
+        return np.asarray(X, dtype=float)
+
+def budgeted_analyzer(monkeypatch):
+    explainer = CountingExplainer()
+    monkeypatch.setattr(shap_analysis, "get_explainer", lambda model, cache_key=None: explainer)
+    analyzer = ShapAnalyzer(SumModel(), FEATURE_COLUMNS)
+    analyzer.shap_available = True
+    return analyzer, explainer
+
+def test_pilot_rows_count_toward_the_sample(monkeypatch):
+    analyzer, explainer = budgeted_analyzer(monkeypatch)
+    X = np.random.default_rng(0).normal(size=(500, len(FEATURE_COLUMNS)))
+
+    values = analyzer.explain_budgeted(X, max_rows=200, time_budget=60, algorithm="tree_path_dependent")
+
+    # Every explained row, pilot included, is in the estimate and none is explained twice
+    assert analyzer.budget_report["n_rows_explained"] == explainer.rows == len(values)
+    assert len(np.unique(analyzer.row_index)) == len(analyzer.row_index)
+    np.testing.assert_array_equal(values, X[analyzer.row_index])
+
+def test_global_document_flags_constant_features():
+    X = np.tile([799, 4, 128, 3240, 12], (24, 1))
+    X[:, 0] = np.arange(24)
+    analyzer = ShapAnalyzer(SumModel(), FEATURE_COLUMNS)
+
+    document = analyzer.build_documents("iPhone 13", 1, X)[0]
+
+    assert document["constant_features"] == FEATURE_COLUMNS[1:]
+    assert "ram" in document["note"]
@@ -0,0 +1,40 @@
+from conftest import seed_sales
+from models import MAX_GRID_CHUNK
+
+GRID = {"model_name": "iPhone 13", "price": {"values": [600, 700, 800]}, "ram": {"values": [4, 6, 8]}}
+
+def seed_catalog():
+    # Products whose specs differ and whose sales differ with them
+    for model_name, scale in [("iPhone 13", 1.0), ("Galaxy S21", 2.0), ("Pixel 6", 3.0)]:
+        seed_sales(model_name, scale=scale)
+
+def test_grid_scores_every_point_in_small_chunks(client):
+    seed_catalog()
+    response = client.post("/simulate/grid", json={**GRID, "chunk_size": 2})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["shape"] == [3, 3, 1, 1, 1]
+    assert len(body["simulated_sales"]) == 9
+    # Spec effects come from the catalog model, so the sweep is not flat
+    assert len(set(body["simulated_sales"])) > 1
+
+def test_simulate_responds_to_spec_changes(client):
+    seed_catalog()
+    response = client.post("/simulate", json={
+        "model_name": "iPhone 13", "price": 599, "ram": 8, "battery": 4614, "camera_mp": 50
+    })
+    assert response.status_code == 200
+    assert response.json()["percent_change"] != 0.0
+
+def test_grid_needs_a_catalog_to_learn_spec_effects(client):
+    seed_sales("iPhone 13")
+    response = client.post("/simulate/grid", json=GRID)
+    assert response.status_code == 422
+
+def test_grid_rejects_oversized_chunk(client):
+    response = client.post("/simulate/grid", json={**GRID, "chunk_size": MAX_GRID_CHUNK + 1})
+    assert response.status_code == 422
+
+def test_grid_rejects_empty_chunk(client):
+    response = client.post("/simulate/grid", json={**GRID, "chunk_size": 0})
+    assert response.status_code == 422
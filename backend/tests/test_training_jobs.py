@@ -0,0 +1,24 @@
+import time
+
+import training_jobs
+from conftest import seed_sales
+
+def wait_for_job(client, job_id):
+    for _ in range(200):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def test_shap_failure_is_reported_on_the_job(client, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("feature_importance unavailable")
+    monkeypatch.setattr(training_jobs, "persist_explanations", fail)
+    seed_sales("iPhone 13")
+
+    job = wait_for_job(client, client.post("/train/iPhone 13").json()["id"])
+    # The model version is stored; only the explanations are missing
+    assert job["status"] == "completed"
+    assert job["result"]["version"] == 1
+    assert job["shap_error"] == "feature_importance unavailable"
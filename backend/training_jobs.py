@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from ml_model import FEATURE_COLUMNS, MLModels, build_training_frame
+from model_registry import ModelRegistry
+from shap_analysis import ShapAnalyzer, SHAP_EXACT_MAX_ROWS
+from tuning import tune_models
+
+logger = logging.getLogger(__name__)
+
+# Leave one core for the event loop by default
+TRAINING_WORKERS = int(os.getenv("TRAINING_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+MAX_PENDING_JOBS = int(os.getenv("MAX_PENDING_JOBS", 100))
+# Finished job records kept for /jobs; older ones are dropped first
+MAX_JOB_HISTORY = int(os.getenv("MAX_JOB_HISTORY", 500))
+
+# Progress reported by a running job at the start of each stage
+JOB_STAGES = {"loading": 0.1, "tuning": 0.2, "fitting": 0.4, "saving": 0.7, "explaining": 0.85}
+
+# Set in each worker process by _init_worker
+_progress_queue = None
+
+class QueueFullError(Exception):
+    pass
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+def report_progress(job_id, stage):
+    if _progress_queue is not None and job_id is not None:
+        _progress_queue.put((job_id, stage))
+
+def persist_explanations(model_name, version, trained, df):
+    """Compute SHAP once for a new model version and store it for /feature-importance"""
+    from database import feature_importance_collection
+
+    X, _ = trained.prepare_feature_data(df)
+    analyzer = ShapAnalyzer(trained.xgboost_model, FEATURE_COLUMNS, cache_key=(model_name, version))
+    if len(X) > SHAP_EXACT_MAX_ROWS:
+        analyzer.explain_budgeted(X, max_rows=SHAP_EXACT_MAX_ROWS)
+    else:
+        analyzer.explain(X)
+    months = list(df['month']) if 'month' in df.columns else None
+    documents = analyzer.build_documents(model_name, version, X, months)
+
+    feature_importance_collection.delete_many({"model": model_name, "version": version})
+    feature_importance_collection.insert_many(documents)
+    # Waterfalls are only kept for the newest version; global importances keep their history
+    feature_importance_collection.delete_many({"model": model_name, "kind": "waterfall", "version": {"$lt": version}})
+
+def run_training_job(registry_root, model_name, product, sales_data, incremental=False, tune_budget=None,
+                     job_id=None):
+    """Executed inside a worker process: fit or update both regressors and store a new version
+
+    With tune_budget (seconds) the hyperparameters are searched first and the models
+    refitted from scratch with the winning configuration. The returned metadata carries
+    the job's stage_timings (seconds) for the API's metrics and shap_error when the
+    explanations could not be stored; neither is saved with the model.
+    """
+    registry = ModelRegistry(registry_root)
+    report_progress(job_id, "loading")
+    started = time.perf_counter()
+    df = build_training_frame(product, sales_data)
+    stage_timings = {'dataframe_build': time.perf_counter() - started}
+    previous = registry.load(model_name) if incremental and not tune_budget else None
+    tuning = None
+    if tune_budget:
+        # Trials run in this worker; the queue's other workers keep training other products
+        report_progress(job_id, "tuning")
+        params, tuning = tune_models(df, tune_budget)
+        report_progress(job_id, "fitting")
+        trained = MLModels()
+        metrics = trained.train_regression_models(df, params)
+        mode = 'full'
+    elif previous is None:
+        report_progress(job_id, "fitting")
+        trained = MLModels()
+        # Keep a previously tuned configuration across full retrains
+        latest = registry.metadata(model_name)
+        metrics = trained.train_regression_models(df, latest.get("params") if latest else None)
+        mode = 'full'
+    else:
+        trained, metadata = previous
+        report_progress(job_id, "fitting")
+        metrics, mode = trained.update_regression_models(df)
+        if mode == 'unchanged':
+            return {**metadata, "stage_timings": stage_timings}
+    stage_timings.update(getattr(trained, 'stage_timings', {}))
+    report_progress(job_id, "saving")
+    metadata = registry.save(model_name, trained, df, metrics, update_mode=mode, tuning=tuning)
+    report_progress(job_id, "explaining")
+    shap_error = None
+    try:
+        persist_explanations(model_name, metadata["version"], trained, df)
+    except Exception as e:
+        # The model version is still usable; /jobs/{id} reports what went wrong
+        logger.exception(f"SHAP persistence error for {model_name} v{metadata['version']}")
+        shap_error = str(e) or type(e).__name__
+    return {**metadata, "stage_timings": stage_timings, "shap_error": shap_error}
+
+class TrainingJobQueue:
+    def __init__(self, registry, model_cache=None, max_workers=TRAINING_WORKERS, max_pending=MAX_PENDING_JOBS,
+                 on_complete=None, max_history=MAX_JOB_HISTORY):
+        self.registry = registry
+        self.model_cache = model_cache
+        self.on_complete = on_complete
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self.jobs = {}
+        self._futures = {}
+        self._active = {}
+        self._executor = None
+        self._progress = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn keeps forked children from inheriting the pymongo client threads
+            context = multiprocessing.get_context("spawn")
+            if self._progress is None:
+                self._progress = context.Queue()
+                threading.Thread(target=self._drain_progress, args=(self._progress,), daemon=True).start()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._progress,)
+            )
+        return self._executor
+
+    def _drain_progress(self, progress):
+        while True:
+            item = progress.get()
+            if item is None:
+                return
+            job_id, stage = item
+            with self._lock:
+                job = self.jobs.get(job_id)
+                # Reports can trail the completion callback; finished jobs keep their final state
+                if job is not None and job["status"] in ("queued", "running"):
+                    job["status"] = "running"
+                    job["stage"] = stage
+                    job["progress"] = JOB_STAGES[stage]
+
+    def _evict_finished(self):
+        """Drop the oldest finished records past max_history; caller holds the lock"""
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] in ("completed", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self.jobs[job_id]
+
+    def submit(self, model_name, product, sales_data, incremental=False, tune_budget=None):
+        with self._lock:
+            # One job per product at a time, so versions never collide
+            active_id = self._active.get(model_name)
+            if active_id is not None:
+                return self.jobs[active_id]
+
+            pending = sum(1 for job in self.jobs.values() if job["status"] in ("queued", "running"))
+            if pending >= self.max_pending:
+                raise QueueFullError(f"Training queue is full ({pending} pending jobs)")
+
+            job_id = uuid.uuid4().hex
+            job = {
+                "id": job_id,
+                "model": model_name,
+                "status": "queued",
+                "stage": None,
+                "progress": 0.0,
+                "n_rows": len(sales_data),
+                "incremental": incremental,
+                "tune_budget": tune_budget,
+                "submitted_at": datetime.now(),
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "shap_error": None
+            }
+            self.jobs[job_id] = job
+            self._active[model_name] = job_id
+
+            try:
+                future = self._get_executor().submit(
+                    run_training_job, self.registry.root, model_name, product, sales_data, incremental, tune_budget,
+                    job_id
+                )
+            except Exception as e:
+                self._active.pop(model_name, None)
+                job["status"] = "failed"
+                job["error"] = f"Could not start training: {e}"
+                job["finished_at"] = datetime.now()
+                # A broken pool never accepts work again; the next submit builds a fresh one
+                self._executor = None
+                self._evict_finished()
+                raise
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+        return job
+
+    def _on_done(self, job_id, future):
+        with self._lock:
+            job = self.jobs[job_id]
+            job["finished_at"] = datetime.now()
+            self._active.pop(job["model"], None)
+            self._futures.pop(job_id, None)
+            try:
+                job["result"] = future.result()
+                job["shap_error"] = job["result"].get("shap_error")
+                job["status"] = "completed"
+                job["stage"] = "done"
+                job["progress"] = 1.0
+            except Exception as e:
+                job["error"] = str(e) or type(e).__name__
+                job["status"] = "failed"
+                if isinstance(e, BrokenProcessPool):
+                    self._executor = None
+                return
+            finally:
+                self._evict_finished()
+        # Next lookup reloads the fresh version from disk
+        if self.model_cache is not None:
+            self.model_cache.invalidate(job["model"])
+        if self.on_complete is not None:
+            self.on_complete(job["model"], job["result"])
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            future = self._futures.get(job_id)
+            if job is not None and future is not None and job["status"] == "queued" and future.running():
+                job["status"] = "running"
+            return job
+
+    def list(self):
+        jobs = (self.get(job_id) for job_id in list(self.jobs))
+        return [job for job in jobs if job is not None]
+
+    async def wait(self, job_id):
+        future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                await asyncio.wrap_future(future)
+            except Exception:
+                pass
+        job = self.get(job_id)
+        if job is None:
+            raise RuntimeError(f"Training job {job_id} is unknown or expired")
+        if job["status"] == "failed":
+            raise RuntimeError(f"Training job {job_id} failed: {job['error']}")
+        return job["result"]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._progress is not None:
+            self._progress.put(None)
+            self._progress = None
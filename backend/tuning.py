@@ -0,0 +1,229 @@
+"""Hyperband search over the XGBoost and RandomForest settings used by MLModels
+
+Each trial trains on a fit fold carved out of the training split and is scored by
+RMSE on a validation fold; the number of trees is the resource that successive
+halving grows for surviving configurations. XGBoost trials stop early on the
+validation fold, and the winning round count becomes the final n_estimators.
+
+Tune the whole catalog overnight, spreading trials over every core:
+
+    python tuning.py --budget-hours 8
+"""
+import argparse
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import train_test_split
+from xgboost import XGBRegressor
+
+TUNING_WORKERS = int(os.getenv("TUNING_WORKERS", os.cpu_count() or 1))
+# Threads per trial when trials run in-process, i.e. inside a training worker that
+# already shares the machine with the rest of the pool
+TUNING_THREADS = int(os.getenv("TUNING_THREADS", 1))
+TUNING_ETA = 3
+EARLY_STOPPING_ROUNDS = 20
+
+logger = logging.getLogger(__name__)
+
+# (min, max) number of trees a trial may be given
+RESOURCE_RANGE = {
+    'xgboost': (27, 729),
+    'random_forest': (10, 270)
+}
+
+def sample_xgboost(rng):
+    return {
+        'learning_rate': float(10 ** rng.uniform(-2.5, -0.5)),
+        'max_depth': int(rng.integers(2, 9)),
+        'min_child_weight': float(10 ** rng.uniform(-1, 1)),
+        'subsample': float(rng.uniform(0.5, 1.0)),
+        'colsample_bytree': float(rng.uniform(0.5, 1.0)),
+        'reg_lambda': float(10 ** rng.uniform(-2, 1))
+    }
+
+def sample_random_forest(rng):
+    return {
+        'max_depth': [None, 4, 8, 16][int(rng.integers(0, 4))],
+        'min_samples_leaf': int(rng.integers(1, 9)),
+        'max_features': [1.0, 0.8, 0.6, 'sqrt'][int(rng.integers(0, 4))]
+    }
+
+SEARCH_SPACES = {
+    'xgboost': sample_xgboost,
+    'random_forest': sample_random_forest
+}
+
+def evaluate_trial(kind, params, resource, data, n_jobs=1):
+    """Train one configuration with `resource` trees; returns (rmse, trees actually needed)"""
+    X_fit, y_fit, X_val, y_val = data
+    if kind == 'xgboost':
+        model = XGBRegressor(
+            **params, n_estimators=resource, early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+            eval_metric='rmse', n_jobs=n_jobs, random_state=42
+        )
+        model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+        return float(model.best_score), int(model.best_iteration) + 1
+    model = RandomForestRegressor(**params, n_estimators=resource, n_jobs=n_jobs, random_state=42)
+    model.fit(X_fit, y_fit)
+    return float(np.sqrt(mean_squared_error(y_val, model.predict(X_val)))), resource
+
+def run_trials(trials, data, deadline, executor=None):
+    """Evaluate (kind, params, resource) trials, skipping whatever has not started by the deadline
+
+    Returns one (score, n_estimators) per trial, or None for trials that did not run.
+    """
+    results = [None] * len(trials)
+    if executor is None:
+        for i, (kind, params, resource) in enumerate(trials):
+            if time.monotonic() >= deadline:
+                break
+            results[i] = evaluate_trial(kind, params, resource, data, n_jobs=TUNING_THREADS)
+        return results
+
+    futures = {
+        executor.submit(evaluate_trial, kind, params, resource, data): i
+        for i, (kind, params, resource) in enumerate(trials)
+    }
+    remaining = set(futures)
+    while remaining:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            # Drop queued trials; ones already running are allowed to finish
+            for future in remaining:
+                future.cancel()
+            timeout = None
+        done, remaining = wait(remaining, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.cancelled():
+                continue
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                logger.warning(f"Tuning trial failed: {e}")
+    return results
+
+def successive_halving(kind, configs, min_resource, max_resource, data, deadline, eta=TUNING_ETA, executor=None):
+    """Give every config `min_resource` trees, keep the best 1/eta, multiply trees by eta, repeat
+
+    Returns a list of finished trials as dicts with params, resource, score and n_estimators.
+    """
+    history = []
+    resource = min_resource
+    while configs and time.monotonic() < deadline:
+        results = run_trials([(kind, params, resource) for params in configs], data, deadline, executor)
+        scored = [(result, params) for result, params in zip(results, configs) if result is not None]
+        history.extend(
+            {"params": params, "resource": resource, "score": score, "n_estimators": n_estimators}
+            for (score, n_estimators), params in scored
+        )
+        if resource >= max_resource or len(scored) <= 1:
+            break
+        scored.sort(key=lambda item: item[0][0])
+        configs = [params for _, params in scored[:max(1, len(scored) // eta)]]
+        resource = min(resource * eta, max_resource)
+    return history
+
+def hyperband(kind, data, time_budget, eta=TUNING_ETA, executor=None, random_state=42):
+    """One Hyperband sweep (most to least aggressive bracket) within `time_budget` seconds"""
+    deadline = time.monotonic() + time_budget
+    rng = np.random.default_rng(random_state)
+    min_resource, max_resource = RESOURCE_RANGE[kind]
+    s_max = int(math.log(max_resource / min_resource, eta) + 1e-9)
+
+    history = []
+    for s in range(s_max, -1, -1):
+        if time.monotonic() >= deadline:
+            break
+        n_configs = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        configs = [SEARCH_SPACES[kind](rng) for _ in range(n_configs)]
+        start = max(min_resource, int(round(max_resource * eta ** -s)))
+        history.extend(successive_halving(kind, configs, start, max_resource, data, deadline, eta, executor))
+    return history
+
+def validation_folds(df, validation_size=0.25):
+    """Split the same training portion MLModels.train_regression_models uses into fit/validation"""
+    from ml_model import FEATURE_COLUMNS
+
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=float)
+    y = df['units_sold'].to_numpy(dtype=float)
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=validation_size, random_state=42)
+    return X_fit, y_fit, X_val, y_val
+
+def tune_models(df, time_budget=60, executor=None, random_state=42):
+    """Search both regressors and return (params, summary)
+
+    params plugs straight into MLModels.train_regression_models; summary records the
+    validation RMSE, number of trials and time spent per estimator.
+    """
+    data = validation_folds(df)
+    params = {}
+    summary = {}
+    # XGBoost gets the larger share: it has the wider space and benefits most from tuning
+    shares = {'xgboost': 0.6, 'random_forest': 0.4}
+    for kind, share in shares.items():
+        started = time.monotonic()
+        history = hyperband(kind, data, time_budget * share, executor=executor, random_state=random_state)
+        if not history:
+            continue
+        best = min(history, key=lambda trial: trial["score"])
+        params[kind] = {**best["params"], "n_estimators": best["n_estimators"]}
+        summary[kind] = {
+            "validation_rmse": best["score"],
+            "trials": len(history),
+            "seconds": time.monotonic() - started
+        }
+    return params, summary
+
+def create_executor(max_workers=TUNING_WORKERS):
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+def main():
+    from database import init_database, smartphones_collection, sales_collection
+    from model_registry import ModelRegistry
+    from ml_model import MLModels, build_training_frame
+    from training_jobs import persist_explanations
+
+    parser = argparse.ArgumentParser(description="Tune and retrain every product's regression models")
+    parser.add_argument("--budget-hours", type=float, default=8.0, help="wall-clock budget for the whole catalog")
+    parser.add_argument("--workers", type=int, default=TUNING_WORKERS)
+    parser.add_argument("--model", action="append", help="only tune these products (repeatable)")
+    args = parser.parse_args()
+
+    init_database()
+    registry = ModelRegistry()
+    query = {"model": {"$in": args.model}} if args.model else {}
+    products = list(smartphones_collection.find(query, {"_id": 0}))
+    deadline = time.monotonic() + args.budget_hours * 3600
+
+    with create_executor(args.workers) as executor:
+        for i, product in enumerate(products):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"Budget exhausted; {len(products) - i} products left untuned")
+                break
+            sales_data = list(sales_collection.find({"model": product["model"]}, {"_id": 0}))
+            if len(sales_data) < 5:
+                continue
+            df = build_training_frame(product, sales_data)
+            # Split what is left evenly so early products cannot starve later ones
+            params, summary = tune_models(df, remaining / (len(products) - i), executor)
+
+            trained = MLModels()
+            metrics = trained.train_regression_models(df, params)
+            metadata = registry.save(product["model"], trained, df, metrics, tuning=summary)
+            try:
+                persist_explanations(product["model"], metadata["version"], trained, df)
+            except Exception:
+                logger.exception(f"SHAP persistence error for {product['model']}")
+            print(f"{product['model']}: v{metadata['version']} {summary}")
+
+if __name__ == "__main__":
+    main()
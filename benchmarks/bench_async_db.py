@@ -0,0 +1,89 @@
+"""Concurrent-request throughput of blocking pymongo calls vs the threadpool-backed async layer
+
+Runs N concurrent "handlers" on one event loop, each doing a product lookup plus a
+sales fetch, first calling pymongo directly (the old handlers) and then awaiting the
+AsyncCollection wrappers from database.py. Event-loop lag is sampled alongside to
+show how long the loop was stalled.
+
+    python benchmarks/bench_async_db.py --requests 2000 --concurrency 64
+
+Requires a reachable MongoDB (MONGO_URI) with the sample data loaded.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from database import (init_database, smartphones_collection, sales_collection,
+                      async_smartphones_collection, async_sales_collection)
+
+async def blocking_handler(model_name):
+    product = smartphones_collection.find_one({"model": model_name})
+    sales = list(sales_collection.find({"model": model_name}, {"_id": 0}))
+    return product, sales
+
+async def async_handler(model_name):
+    product = await async_smartphones_collection.find_one({"model": model_name})
+    sales = await async_sales_collection.find({"model": model_name}, {"_id": 0})
+    return product, sales
+
+async def monitor_lag(stop, samples, interval=0.005):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+async def run(handler, model_names, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await handler(model_names[i % len(model_names)])
+            latencies.append(time.perf_counter() - started)
+
+    stop = asyncio.Event()
+    lag = []
+    monitor = asyncio.create_task(monitor_lag(stop, lag))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "seconds": elapsed,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max_loop_lag_ms": max(lag, default=0) * 1000,
+        "mean_loop_lag_ms": statistics.fmean(lag) * 1000 if lag else 0.0,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    init_database()
+    model_names = [p["model"] for p in smartphones_collection.find({}, {"model": 1})]
+
+    # Warm connections for both paths before measuring
+    await run(async_handler, model_names, min(100, args.requests), args.concurrency)
+
+    for label, handler in (("blocking pymongo", blocking_handler), ("async layer", async_handler)):
+        result = await run(handler, model_names, args.requests, args.concurrency)
+        print(f"{label:>17}: {result['throughput_rps']:8.1f} req/s  "
+              f"p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  "
+              f"max loop lag {result['max_loop_lag_ms']:7.2f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,262 @@
+"""Wall time, peak RSS and throughput of the backend hot paths on synthetic data
+
+Each case runs in a fresh spawned process so its peak RSS is its own. The catalog
+is regenerated deterministically inside every case (not timed). Results go to a
+JSON file that --compare can diff against a previous run:
+
+    python benchmarks/bench_hot_paths.py --scale seed
+    python benchmarks/bench_hot_paths.py --scale large --output bench_large.json
+    python benchmarks/bench_hot_paths.py --scale seed --compare benchmarks/results/<old>.json
+
+Runs offline: without --mongo-uri the dashboard cases use mongomock in memory
+(pip install -r benchmarks/requirements.txt).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_data import SCALES, generate_catalog, product_sales, use_in_memory_mongo, load_into_mongo
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def train_products(products, sales, n):
+    from ml_model import build_training_frame
+    step = max(1, len(products) // n)
+    return [build_training_frame(*product_sales(products, sales, i)) for i in range(0, len(products), step)][:n]
+
+def trained_model(products, sales):
+    from ml_model import MLModels
+    trained = MLModels()
+    trained.train_regression_models(train_products(products, sales, 1)[0])
+    return trained
+
+# Each setup returns (run, items, unit): run() is the timed part, items what it processed
+
+def setup_train_regression_models(products, sales, options):
+    from ml_model import MLModels
+    frames = train_products(products, sales, options.train_products)
+
+    def run():
+        for df in frames:
+            MLModels().train_regression_models(df)
+    return run, len(frames), "products"
+
+def setup_predict_sales(products, sales, options):
+    from ml_model import FEATURE_COLUMNS
+    trained = trained_model(products, sales)
+    features = products[FEATURE_COLUMNS].to_numpy(dtype=float)[:options.calls].tolist()
+
+    def run():
+        for row in features:
+            trained.predict_sales(row)
+    return run, len(features), "calls"
+
+def setup_hybrid_prediction(products, sales, options):
+    from ml_model import FEATURE_COLUMNS
+    trained = trained_model(products, sales)
+    features = products[FEATURE_COLUMNS].to_numpy(dtype=float)[:options.calls].tolist()
+
+    def run():
+        for row in features:
+            trained.hybrid_prediction(row, time_series_pred=1000.0)
+    return run, len(features), "calls"
+
+def setup_hybrid_prediction_batch(products, sales, options):
+    from ml_model import FEATURE_COLUMNS
+    trained = trained_model(products, sales)
+    X = products[FEATURE_COLUMNS].to_numpy(dtype=float)
+
+    def run():
+        trained.hybrid_prediction_batch(X, time_series_pred=1000.0)
+    return run, len(X), "rows"
+
+def setup_shap_explain(products, sales, options):
+    from ml_model import FEATURE_COLUMNS
+    from shap_analysis import ShapAnalyzer, SHAP_AVAILABLE
+    if not SHAP_AVAILABLE:
+        return None
+    trained = trained_model(products, sales)
+    X = products[FEATURE_COLUMNS].iloc[:options.shap_rows]
+
+    def run():
+        ShapAnalyzer(trained.xgboost_model, FEATURE_COLUMNS).explain(X)
+    return run, len(X), "rows"
+
+def setup_forecast_catalog(products, sales, options):
+    from forecasting import forecast_catalog
+    frame = sales[["model", "month", "units_sold"]]
+
+    def run():
+        forecast_catalog(frame, periods=6)
+    return run, len(frame), "rows"
+
+def setup_dashboard_data(products, sales, options):
+    if not options.mongo_uri and not use_in_memory_mongo():
+        return None
+    rows = min(len(sales), options.dashboard_rows)
+    # Keep whole products so brand filters still see complete histories
+    n_months = len(sales) // len(products)
+    n_products = max(1, rows // n_months)
+    load_into_mongo(products.iloc[:n_products], sales.iloc[:n_products * n_months])
+    from database import get_dashboard_summary, query_sales_trend
+    brand = products["brand"].iloc[0]
+
+    def run():
+        # Same queries /dashboard-data issues on a cache miss, unfiltered and by brand
+        for _ in range(options.dashboard_requests):
+            get_dashboard_summary()
+            query_sales_trend(limit=120)
+            query_sales_trend(brand=brand, limit=120)
+    return run, options.dashboard_requests, "requests"
+
+def setup_dashboard_rebuild(products, sales, options):
+    if not options.mongo_uri and not use_in_memory_mongo():
+        return None
+    rows = min(len(sales), options.dashboard_rows)
+    n_months = len(sales) // len(products)
+    n_products = max(1, rows // n_months)
+    load_into_mongo(products.iloc[:n_products], sales.iloc[:n_products * n_months])
+    from database import rebuild_dashboard_summary
+
+    def run():
+        rebuild_dashboard_summary()
+    return run, n_products * n_months, "rows"
+
+CASES = {
+    "train_regression_models": setup_train_regression_models,
+    "predict_sales": setup_predict_sales,
+    "hybrid_prediction": setup_hybrid_prediction,
+    "hybrid_prediction_batch": setup_hybrid_prediction_batch,
+    "shap_explain": setup_shap_explain,
+    "forecast_catalog": setup_forecast_catalog,
+    "dashboard_data": setup_dashboard_data,
+    "dashboard_rebuild": setup_dashboard_rebuild,
+}
+
+def run_case(name, options):
+    """Executed in a child process: build data, time the case, report RSS"""
+    if options.mongo_uri:
+        os.environ["MONGO_URI"] = options.mongo_uri
+    products, sales = generate_catalog(options.products, options.months, options.seed)
+    setup = CASES[name](products, sales, options)
+    if setup is None:
+        return {"case": name, "skipped": True}
+    run, items, unit = setup
+    rss_before = peak_rss_mb()
+
+    timings = []
+    for _ in range(options.repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    wall = min(timings)
+    return {
+        "case": name,
+        "wall_seconds": wall,
+        "items": items,
+        "unit": unit,
+        "throughput_per_second": items / wall if wall > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "setup_peak_rss_mb": rss_before,
+        "repeat": options.repeat,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(report, baseline_path):
+    with open(baseline_path) as f:
+        previous = json.load(f)
+    baseline = {r["case"]: r for r in previous["results"] if not r.get("skipped")}
+    print(f"\nvs {baseline_path} (commit {previous.get('commit')})")
+    if (previous.get("products"), previous.get("months")) != (report["products"], report["months"]):
+        print(f"warning: baseline ran {previous.get('products')}x{previous.get('months')}, "
+              f"this run {report['products']}x{report['months']}; ratios are not comparable")
+    results = report["results"]
+    for result in results:
+        old = baseline.get(result["case"])
+        if result.get("skipped") or old is None:
+            continue
+        ratio = result["wall_seconds"] / old["wall_seconds"] if old["wall_seconds"] else float("nan")
+        flag = "  SLOWER" if ratio > 1.1 else ""
+        print(f"{result['case']:>25}: {ratio:6.2f}x time  "
+              f"{result['peak_rss_mb'] - old['peak_rss_mb']:+9.1f} MB peak RSS{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="seed")
+    parser.add_argument("--products", type=int, help="override the scale's product count")
+    parser.add_argument("--months", type=int, help="override the scale's month count")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--train-products", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=2000, help="single-row calls for predict/hybrid")
+    parser.add_argument("--shap-rows", type=int, default=5000)
+    parser.add_argument("--dashboard-rows", type=int, default=200000,
+                        help="sales rows loaded into Mongo for the dashboard cases")
+    parser.add_argument("--dashboard-requests", type=int, default=20)
+    parser.add_argument("--mongo-uri", help="use this MongoDB (its smartphone_sales db is overwritten)")
+    parser.add_argument("--output", help="JSON path (default benchmarks/results/<commit>-<scale>.json)")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    options = parser.parse_args()
+
+    products, months = SCALES[options.scale]
+    options.products = options.products or products
+    options.months = options.months or months
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in options.cases:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_case, (name, options))
+        results.append(result)
+        if result.get("skipped"):
+            print(f"{name:>25}: skipped (dependency unavailable)")
+        else:
+            print(f"{name:>25}: {result['wall_seconds']:9.4f} s  "
+                  f"{result['throughput_per_second']:12.1f} {result['unit']}/s  "
+                  f"peak RSS {result['peak_rss_mb']:8.1f} MB")
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(),
+        "scale": options.scale,
+        "products": options.products,
+        "months": options.months,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "mongo": options.mongo_uri or "mongomock",
+        "results": results,
+    }
+    output = options.output or os.path.join(RESULTS_DIR, f"{commit or 'local'}-{options.scale}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if options.compare:
+        compare(report, options.compare)
+
+if __name__ == "__main__":
+    main()
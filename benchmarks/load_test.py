@@ -0,0 +1,374 @@
+"""End-to-end load test: concurrent virtual users driving the FastAPI app with a traffic mix
+
+Closed-loop users are started linearly over --ramp-up seconds and each keeps
+sending requests picked from the mix until --duration ends. Latency percentiles,
+throughput and error rate are reported per route (and written as JSON with --output).
+
+Traffic spread over a few hot products repeats itself, so after the first hit
+/predict, /forecast and /dashboard-data come from the response cache and /chat from
+the chat cache: default numbers measure warm-cache serving. The report includes
+each cache's hit ratio over the measured window; --bust-caches makes every request
+unique so the numbers measure the compute path (model inference, Mongo queries,
+LLM calls) instead.
+
+Against a local MongoDB, with the stub LLM, starting the server here:
+
+    python benchmarks/load_test.py run --spawn --reset-db --workers 2 --users 64 --mix launch
+
+Fully offline (server process uses mongomock; one uvicorn worker):
+
+    python benchmarks/load_test.py run --spawn --in-memory --users 32 --duration 60
+
+Against a server that is already running (seeded with this script's data):
+
+    python benchmarks/load_test.py run --url http://localhost:8000 --mix browse
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_data import SCALES, BACKEND_DIR, generate_catalog, generate_products, use_in_memory_mongo, load_into_mongo
+
+# Spawned training workers re-import this module, so they pick up mongomock too
+if os.getenv("LOADTEST_IN_MEMORY") == "1":
+    use_in_memory_mongo()
+
+# Relative weights per route
+MIXES = {
+    "browse": {"dashboard": 55, "predict": 20, "forecast": 15, "simulate": 5, "chat": 5},
+    "launch": {"predict": 35, "simulate": 25, "dashboard": 20, "forecast": 10, "chat": 10},
+    "analyst": {"chat": 40, "simulate": 30, "predict": 15, "dashboard": 15},
+}
+
+CHAT_QUERIES = [
+    "Why are sales decreasing for {model}?",
+    "Which features drive {brand} sales the most?",
+    "Should we cut the price of {model}?",
+    "How does {model} compare with the rest of {brand}?",
+    "What is the sales outlook for {brand} next quarter?",
+]
+
+# Server-side caches and the /cache/* endpoint reporting each one's statistics
+CACHE_ENDPOINTS = {
+    "responses": "/cache/responses",
+    "chat": "/cache/chat",
+    "models": "/cache/models",
+    "forecasts": "/cache/forecasts",
+}
+
+def bust(path, rng):
+    """Unique query parameter so the response cache never matches (the app ignores it)"""
+    return f"{path}{'&' if '?' in path else '?'}nocache={rng.getrandbits(48):x}"
+
+def build_request(route, rng, products, bust_caches=False):
+    """(label, method, path, json body) for one request of the given route"""
+    label, method, path, body = _build_request(route, rng, products)
+    if bust_caches:
+        if method == "GET":
+            path = bust(path, rng)
+        elif route == "chat":
+            body = {"query": f"{body['query']} (ref {rng.getrandbits(48):x})"}
+    return label, method, path, body
+
+def _build_request(route, rng, products):
+    product = products[rng.randrange(len(products))]
+    if route == "predict":
+        return route, "GET", f"/predict/{product['model']}", None
+    if route == "forecast":
+        return route, "GET", f"/forecast/{product['model']}?periods={rng.randint(1, 12)}", None
+    if route == "simulate":
+        body = {
+            "model_name": product["model"],
+            "price": round(product["price"] * rng.uniform(0.8, 1.2), 2),
+            "ram": int(product["ram"]),
+            "camera_mp": int(product["camera_mp"]),
+            "battery": int(product["battery"]),
+        }
+        return route, "POST", "/simulate", body
+    if route == "chat":
+        query = rng.choice(CHAT_QUERIES).format(model=product["model"], brand=product["brand"])
+        return route, "POST", "/chat", {"query": query}
+    if route == "dashboard":
+        # Mostly the landing view, sometimes a brand drill-down
+        path = "/dashboard-data" if rng.random() < 0.7 else f"/dashboard-data?brand={product['brand']}"
+        return route, "GET", path, None
+    raise ValueError(f"Unknown route '{route}'")
+
+def parse_mix(value):
+    """Preset name or 'route=weight,route=weight'"""
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        mix[route.strip()] = float(weight or 1)
+    return mix
+
+async def send(client, method, path, body):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, path, json=body)
+        error = None if response.status_code < 400 else f"HTTP {response.status_code}"
+    except Exception as e:
+        error = type(e).__name__
+    return time.perf_counter() - started, error
+
+async def virtual_user(client, rng, mix, products, start_delay, stop_at, think_time, samples, bust_caches=False):
+    await asyncio.sleep(start_delay)
+    routes, weights = list(mix), list(mix.values())
+    while time.perf_counter() < stop_at:
+        label, method, path, body = build_request(rng.choices(routes, weights)[0], rng, products, bust_caches)
+        latency, error = await send(client, method, path, body)
+        samples.append((label, time.perf_counter(), latency, error))
+        if think_time:
+            await asyncio.sleep(rng.expovariate(1 / think_time))
+
+async def warm_up(client, products, concurrency=8):
+    """Train every hot product once so the measured run sees steady state, not cold training"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(product):
+        async with semaphore:
+            await client.get(f"/predict/{product['model']}")
+    await asyncio.gather(*(one(product) for product in products))
+
+async def cache_stats(client):
+    """Snapshot of every server cache's counters; None for caches the server does not expose"""
+    async def one(path):
+        try:
+            response = await client.get(path)
+            return response.json() if response.status_code == 200 else None
+        except Exception:
+            return None
+    snapshots = await asyncio.gather(*(one(path) for path in CACHE_ENDPOINTS.values()))
+    return dict(zip(CACHE_ENDPOINTS, snapshots))
+
+def _hits(stats):
+    # The chat cache splits hits into exact and similar-query matches
+    return stats.get("hits", stats.get("exact_hits", 0) + stats.get("similar_hits", 0))
+
+def cache_report(before, after):
+    """Hits, misses and hit ratio per cache between two snapshots"""
+    report = {}
+    for name in CACHE_ENDPOINTS:
+        if not before.get(name) or not after.get(name):
+            continue
+        hits = _hits(after[name]) - _hits(before[name])
+        misses = after[name].get("misses", 0) - before[name].get("misses", 0)
+        report[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else None,
+        }
+    return report
+
+def summarize(samples, window):
+    """Per-route latency percentiles (ms), throughput and error rate over the measured window"""
+    report = {}
+    groups = {}
+    for label, _, latency, error in samples:
+        groups.setdefault(label, []).append((latency, error))
+    groups["all"] = [(latency, error) for _, _, latency, error in samples]
+    for label, rows in sorted(groups.items()):
+        latencies = np.array([latency for latency, _ in rows]) * 1000
+        errors = [error for _, error in rows if error]
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0, 0, 0)
+        report[label] = {
+            "requests": len(rows),
+            "throughput_rps": len(rows) / window if window else 0.0,
+            "error_rate": len(errors) / len(rows) if rows else 0.0,
+            "errors": {e: errors.count(e) for e in set(errors)},
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(latencies.max()) if len(latencies) else 0.0,
+        }
+    return report
+
+async def run_load(options, products):
+    import httpx
+
+    limits = httpx.Limits(max_connections=options.users, max_keepalive_connections=options.users)
+    async with httpx.AsyncClient(base_url=options.url, timeout=options.timeout, limits=limits) as client:
+        if options.warmup:
+            print(f"Warming up {len(products)} products...")
+            await warm_up(client, products)
+
+        mix = parse_mix(options.mix)
+        samples = []
+        started = time.perf_counter()
+        stop_at = started + options.ramp_up + options.duration
+        users = [
+            virtual_user(client, random.Random(options.seed + i), mix, products,
+                         options.ramp_up * i / options.users, stop_at, options.think_time, samples,
+                         options.bust_caches)
+            for i in range(options.users)
+        ]
+
+        async def snapshot_after_ramp_up():
+            await asyncio.sleep(options.ramp_up)
+            return await cache_stats(client)
+        before, _ = await asyncio.gather(snapshot_after_ramp_up(), asyncio.gather(*users))
+        after = await cache_stats(client)
+
+    # Only the steady-state part after ramp-up counts towards the report
+    measured_from = started + options.ramp_up
+    measured = [s for s in samples if s[1] >= measured_from]
+    return summarize(measured, options.duration), cache_report(before, after), mix
+
+def wait_for_server(url, timeout=120, server=None):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server process exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not become healthy within {timeout}s")
+
+def spawn_server(options, model_dir=None):
+    env = {**os.environ, "CHAT_BACKEND": "stub", "STUB_LLM_LATENCY": str(options.llm_latency)}
+    port = options.url.rsplit(":", 1)[-1].strip("/")
+    if options.in_memory:
+        command = [sys.executable, os.path.abspath(__file__), "serve", "--port", port,
+                   "--scale", options.scale, "--seed", str(options.seed), "--model-dir", model_dir]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+                   "--port", port, "--workers", str(options.workers), "--log-level", "warning"]
+    return subprocess.Popen(command, env=env)
+
+def serve(options):
+    """Run the app in this process on mongomock, seeded with the synthetic catalog"""
+    os.environ["LOADTEST_IN_MEMORY"] = "1"
+    os.environ.setdefault("CHAT_BACKEND", "stub")
+    # Models trained on the synthetic catalog must not land in the real registry. A spawning
+    # run passes its own directory and removes it, since uvicorn exits on SIGTERM without
+    # unwinding; a directory created here is removed when the server stops on Ctrl-C
+    owned = options.model_dir is None
+    model_dir = tempfile.mkdtemp(prefix="loadtest-models-") if owned else options.model_dir
+    os.environ["MODEL_DIR"] = model_dir
+    use_in_memory_mongo()
+    import uvicorn
+
+    try:
+        n_products, n_months = SCALES[options.scale]
+        load_into_mongo(*generate_catalog(n_products, n_months, options.seed))
+        sys.path.insert(0, BACKEND_DIR)
+        from main import app
+        uvicorn.run(app, host="127.0.0.1", port=options.port, log_level="warning")
+    finally:
+        if owned:
+            shutil.rmtree(model_dir, ignore_errors=True)
+
+def print_report(report, caches):
+    print(f"{'route':>10} {'requests':>9} {'rps':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, row in report.items():
+        print(f"{label:>10} {row['requests']:9d} {row['throughput_rps']:8.1f} {row['error_rate']:7.1%} "
+              f"{row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f}")
+    print(f"\n{'cache':>10} {'hits':>9} {'misses':>9} {'hit ratio':>10}")
+    for name, row in caches.items():
+        ratio = f"{row['hit_ratio']:10.1%}" if row["hit_ratio"] is not None else f"{'-':>10}"
+        print(f"{name:>10} {row['hits']:9d} {row['misses']:9d} {ratio}")
+
+def run(options):
+    n_products, n_months = SCALES[options.scale]
+    catalog = generate_products(n_products, options.seed)
+    products = catalog.iloc[:min(options.hot_products, n_products)].to_dict("records")
+
+    server = None
+    model_dir = None
+    if options.spawn:
+        if not options.in_memory and options.reset_db:
+            load_into_mongo(*generate_catalog(n_products, n_months, options.seed))
+        if options.in_memory:
+            model_dir = tempfile.mkdtemp(prefix="loadtest-models-")
+        server = spawn_server(options, model_dir)
+    try:
+        wait_for_server(options.url, server=server)
+        report, caches, mix = asyncio.run(run_load(options, products))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if model_dir is not None:
+            shutil.rmtree(model_dir, ignore_errors=True)
+
+    print_report(report, caches)
+    if not options.spawn or options.workers > 1:
+        print("(cache counters come from whichever worker answered /cache/*; each worker has its own caches)")
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(),
+                "url": options.url,
+                "mix": mix,
+                "users": options.users,
+                "ramp_up": options.ramp_up,
+                "duration": options.duration,
+                "workers": options.workers if options.spawn else None,
+                "llm_latency": options.llm_latency if options.spawn else None,
+                "bust_caches": options.bust_caches,
+                "routes": report,
+                "caches": caches,
+            }, f, indent=2)
+        print(f"Wrote {options.output}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="generate load against the app")
+    run_parser.add_argument("--url", default="http://127.0.0.1:8765")
+    run_parser.add_argument("--mix", default="launch", help=f"one of {sorted(MIXES)} or 'route=weight,...'")
+    run_parser.add_argument("--users", type=int, default=32, help="concurrent virtual users")
+    run_parser.add_argument("--ramp-up", type=float, default=10.0, help="seconds to start all users")
+    run_parser.add_argument("--duration", type=float, default=30.0, help="measured seconds after ramp-up")
+    run_parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a user's requests")
+    run_parser.add_argument("--timeout", type=float, default=60.0)
+    run_parser.add_argument("--hot-products", type=int, default=20, help="products the traffic is spread over")
+    run_parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    run_parser.add_argument("--bust-caches", action="store_true",
+                            help="make every request unique so response and chat caches never hit")
+    run_parser.add_argument("--spawn", action="store_true", help="start the server (stub LLM) for this run")
+    run_parser.add_argument("--in-memory", action="store_true", help="spawned server uses mongomock")
+    run_parser.add_argument("--reset-db", action="store_true",
+                            help="reseed the local MongoDB with the synthetic catalog (destructive)")
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn")
+    run_parser.add_argument("--llm-latency", type=float, default=0.5, help="stub LLM seconds per answer")
+    run_parser.add_argument("--output", help="write the report as JSON")
+
+    serve_parser = commands.add_parser("serve", help="run the app on mongomock (used by --in-memory)")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--model-dir", help="model registry directory (default: a temporary one)")
+
+    for sub in (run_parser, serve_parser):
+        sub.add_argument("--scale", choices=sorted(SCALES), default="seed")
+        sub.add_argument("--seed", type=int, default=0)
+
+    options = parser.parse_args()
+    if options.command == "serve":
+        serve(options)
+    else:
+        if options.in_memory and options.workers != 1:
+            parser.error("--in-memory runs a single worker; each process would get its own empty database")
+        run(options)
+
+if __name__ == "__main__":
+    main()
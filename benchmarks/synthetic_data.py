@@ -0,0 +1,112 @@
+"""Deterministic synthetic catalog and sales history for benchmarks and load tests
+
+Products follow the shape of the seeded catalog in database.load_sample_data and
+sales are a level + trend + yearly season + noise per product, generated column-wise
+with numpy so 100k products x 60 months (6M rows) fits in a few seconds.
+
+Point the backend at MongoDB or, with no server around, call use_in_memory_mongo()
+before anything imports database.py to swap pymongo for mongomock.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# (products, months); "seed" matches the 39 phones database.load_sample_data inserts
+SCALES = {
+    "seed": (39, 24),
+    "small": (1000, 36),
+    "medium": (10000, 60),
+    "large": (100000, 60),
+}
+
+BRANDS = ["Apple", "Samsung", "Google", "OnePlus", "Xiaomi", "Oppo", "Vivo", "Realme",
+          "Motorola", "Nothing", "Sony", "Asus", "Nokia", "Honor", "Poco"]
+
+def use_in_memory_mongo():
+    """Route every MongoClient to mongomock; returns False if mongomock is not installed"""
+    try:
+        import mongomock
+        import pymongo
+    except ImportError:
+        return False
+    if "database" in sys.modules:
+        raise RuntimeError("use_in_memory_mongo() must run before database.py is imported")
+    pymongo.MongoClient = mongomock.MongoClient
+    return True
+
+def generate_products(n_products, seed=0):
+    rng = np.random.default_rng(seed)
+    brands = np.array(BRANDS)[np.arange(n_products) % len(BRANDS)]
+    return pd.DataFrame({
+        "brand": brands,
+        "model": [f"{brand} Phone {i}" for i, brand in enumerate(brands)],
+        "price": rng.integers(150, 1400, n_products).astype(float),
+        "ram": rng.choice([3, 4, 6, 8, 12, 16], n_products),
+        "storage": rng.choice([32, 64, 128, 256, 512], n_products),
+        "battery": rng.integers(3000, 6000, n_products),
+        "camera_mp": rng.choice([12, 48, 50, 64, 108, 200], n_products),
+        "os": np.where(brands == "Apple", "iOS", "Android"),
+        "launch_date": "2021-01-01",
+    })
+
+def generate_sales(products, n_months, seed=0, start="2019-01"):
+    """Sales rows ordered by product then month (each product's block is contiguous)"""
+    rng = np.random.default_rng(seed + 1)
+    n_products = len(products)
+    months = [str(p) for p in pd.period_range(start, periods=n_months, freq="M")]
+    t = np.arange(n_months)
+
+    # Cheaper phones with more RAM sell more; every product gets its own trend and season phase
+    level = 40000 - 18 * products["price"].to_numpy() + 800 * products["ram"].to_numpy()
+    level = np.maximum(level, 2000)[:, None] * rng.uniform(0.5, 1.5, (n_products, 1))
+    trend = rng.normal(0.0, 0.01, (n_products, 1)) * level
+    season = 0.15 * level * np.sin(2 * np.pi * (t[None, :] + rng.integers(0, 12, (n_products, 1))) / 12)
+    units = level + trend * t[None, :] + season + rng.normal(0, 0.05, (n_products, n_months)) * level
+    units = np.maximum(units, 0).round()
+
+    price = np.repeat(products["price"].to_numpy(), n_months)
+    return pd.DataFrame({
+        "model": np.repeat(products["model"].to_numpy(), n_months),
+        "month": np.tile(months, n_products),
+        "units_sold": units.ravel().astype(int),
+        "revenue": units.ravel() * price,
+        "promotions": rng.random(n_products * n_months) < 0.1,
+        "competitor_launch": rng.random(n_products * n_months) < 0.05,
+    })
+
+def generate_catalog(n_products, n_months, seed=0):
+    products = generate_products(n_products, seed)
+    return products, generate_sales(products, n_months, seed)
+
+def product_sales(products, sales, index):
+    """(product dict, sales rows) for one product, relying on generate_sales' block layout"""
+    n_months = len(sales) // len(products)
+    product = products.iloc[index].to_dict()
+    rows = sales.iloc[index * n_months:(index + 1) * n_months].to_dict("records")
+    return product, rows
+
+def iter_records(frame, batch_size=10000):
+    for start in range(0, len(frame), batch_size):
+        yield frame.iloc[start:start + batch_size].to_dict("records")
+
+def load_into_mongo(products, sales, batch_size=10000):
+    """Replace the backend collections with the synthetic catalog and rebuild the dashboard summary"""
+    import database
+
+    database.smartphones_collection.delete_many({})
+    database.sales_collection.delete_many({})
+    database.dashboard_summary_collection.delete_many({})
+    # Indexes first so bulk inserts are measured the way production sees them
+    database.init_database()
+    database.smartphones_collection.delete_many({})
+    for batch in iter_records(products, batch_size):
+        database.smartphones_collection.insert_many(batch)
+    for batch in iter_records(sales, batch_size):
+        database.sales_collection.insert_many(batch)
+    return database.rebuild_dashboard_summary()
@@ -4,6 +4,7 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import requests
+import json
 from datetime import datetime, timedelta
 import time
 
@@ -303,6 +304,176 @@ def load_sales_data():
         ]
     }
 
+@st.cache_data(ttl=300)
+def load_forecast(model_name, periods):
+    """Blended forecast from the backend; cached per (model, horizon) like the dashboard data"""
+    try:
+        response = requests.get(f"{API_URL}/forecast/{model_name}", params={"periods": periods}, timeout=60)
+        if response.status_code == 200:
+            return response.json()
+    except Exception:
+        pass
+    return None
+
+@st.cache_data(ttl=300)
+def load_backtest(model_name=None):
+    """Latest rolling-origin backtest errors for a model, or the whole catalog"""
+    try:
+        params = {"model": model_name} if model_name else {}
+        response = requests.get(f"{API_URL}/backtest", params=params, timeout=5)
+        if response.status_code == 200:
+            return response.json()
+    except Exception:
+        pass
+    return None
+
+def summarize_backtest(horizons, periods):
+    """Average per-horizon errors over the first `periods` months, weighted by window count"""
+    rows = [row for row in horizons if row['horizon'] <= periods]
+    total = sum(row['n'] for row in rows)
+    if not total:
+        return None
+    mape_rows = [row for row in rows if row['mape'] is not None]
+    mape_total = sum(row['n'] for row in mape_rows)
+    return {
+        'MAE': f"{sum(row['mae'] * row['n'] for row in rows) / total:,.0f}",
+        'RMSE': f"{(sum(row['rmse'] ** 2 * row['n'] for row in rows) / total) ** 0.5:,.0f}",
+        'MAPE': f"{sum(row['mape'] * row['n'] for row in mape_rows) / mape_total:.1f}%" if mape_total else "n/a",
+        'Windows': f"{total:,}"
+    }
+
+def stream_chat(query):
+    """Yield answer chunks from the backend's Server-Sent Events endpoint"""
+    with requests.post(f"{API_URL}/chat/stream", json={"query": query}, stream=True, timeout=(5, 60)) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                event = None
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                payload = json.loads(line[len("data:"):].strip())
+                if event == "done":
+                    return
+                if event == "error":
+                    raise RuntimeError(payload.get("error", "Chat stream failed"))
+                yield payload.get("token", "")
+
+def generate_ai_response(query):
+    """Generate intelligent responses based on query keywords"""
+    query_lower = query.lower()
+    
+    if "trend" in query_lower or "market" in query_lower:
+        return """📈 **Market Trends Analysis:**
+
+**Current Trends (2024):**
+1. **Premiumization**: Average selling price up 12% to $420
+2. **AI Integration**: On-device AI becoming key differentiator
+3. **Foldables**: 65% growth, expected to reach 30M units
+4. **Sustainability**: 40% consumers consider eco-friendly features
+5. **5G Adoption**: 85% of new launches include 5G
+
+**Regional Insights:**
+- **Asia Pacific**: +8% growth, driven by India and Southeast Asia
+- **North America**: +3% growth, premium segment focus
+- **Europe**: Stable, replacement-driven market
+- **Latin America**: +12% growth, budget segment focus"""
+    
+    elif "competitor" in query_lower or "competition" in query_lower:
+        return """🎯 **Competitive Landscape Analysis:**
+
+**Market Share Q2 2024:**
+- Samsung: 22.5% (↑1.2%)
+- Apple: 20.8% (↑2.1%)
+- Xiaomi: 14.2% (↓0.5%)
+- Oppo: 9.5% (↓0.3%)
+- Vivo: 8.7% (↑0.2%)
+- Others: 24.3%
+
+**Key Competitive Moves:**
+- Apple: Aggressive pricing in India, manufacturing diversification
+- Samsung: AI features in mid-range, foldable expansion
+- Xiaomi: Premium push with Leica partnership
+- Google: Vertical integration with Tensor chips
+
+**Threats:**
+- Refurbished market growing 15% annually
+- Chinese brands entering new markets
+- Regulatory pressures in Europe"""
+    
+    elif "profit" in query_lower or "margin" in query_lower:
+        return """💰 **Profitability Analysis:**
+
+**Average Margins by Segment:**
+- Premium ($800+): 45-50% margin
+- Mid-range ($400-800): 25-30% margin
+- Budget (<$400): 10-15% margin
+
+**Cost Breakdown (Mid-range):**
+- Components: 55% (Display, SoC, Camera, Battery)
+- R&D: 12%
+- Marketing: 15%
+- Distribution: 8%
+- Profit: 10%
+
+**Optimization Strategies:**
+1. Reduce SKU count by 20% to save costs
+2. Increase direct-to-consumer sales
+3. Bundle services (cloud, warranty) for higher margins
+4. Use common components across models"""
+    
+    elif "feature" in query_lower or "spec" in query_lower:
+        return """🔧 **Feature Impact Analysis:**
+
+**Most Valued Features by Segment:**
+
+**Premium ($800+):**
+1. Camera quality (40%)
+2. Build quality/design (25%)
+3. Display technology (20%)
+4. Brand prestige (15%)
+
+**Mid-range ($400-800):**
+1. Value for money (35%)
+2. Camera (25%)
+3. Battery life (20%)
+4. Performance (20%)
+
+**Budget (<$400):**
+1. Price (40%)
+2. Battery life (30%)
+3. Display size (15%)
+4. RAM/Storage (15%)
+
+**Emerging Features:**
+- AI capabilities (+15% interest YoY)
+- Satellite connectivity (+25%)
+- Repairability (+30%)"""
+    
+    else:
+        return """📊 **General Business Insights:**
+
+Based on your query, here are key insights from the data:
+
+**Sales Performance:**
+- Total market: 1.2B units annually
+- Growth rate: 3.5% YoY
+- ASP: $402 (↑4% YoY)
+
+**Top Recommendations:**
+1. Focus on camera innovation for premium segment
+2. Optimize pricing for mid-range ($400-600 sweet spot)
+3. Expand in emerging markets (India, LATAM, Africa)
+4. Invest in AI features for differentiation
+5. Develop sustainable practices for brand value
+
+**Would you like specific analysis on:**
+- Feature importance by segment
+- Regional market trends
+- Competitive benchmarking
+- Pricing optimization strategies"""
+
 # Dashboard Page
 if page == "📊 Dashboard":
     st.title("📊 Sales Intelligence Dashboard")
@@ -476,7 +647,9 @@ elif page == "🔮 Forecasting":
         st.subheader(f"📊 {forecast_period}-Month Sales Forecast")
         st.markdown(f"### {st.session_state.selected_model}")
         
-        # Generate dynamic forecast data with realistic patterns
+        forecast = load_forecast(forecast_model, forecast_period)
+        
+        # Fall back to an illustrative curve when the backend has no data for this model
         dates = pd.date_range(start=datetime.now(), periods=forecast_period, freq='M')
         
         # Base sales based on brand and model (realistic values)
@@ -525,6 +698,16 @@ elif page == "🔮 Forecasting":
             ]
         })
         
+        if forecast is not None:
+            forecast_data = pd.DataFrame({
+                'Date': pd.to_datetime(forecast['months']),
+                'Predicted Sales': forecast['forecast'],
+                'Lower Bound': forecast['lower'],
+                'Upper Bound': forecast['upper']
+            })
+        else:
+            st.caption("⚠️ Backend forecast unavailable - showing an illustrative projection")
+        
         fig = go.Figure()
         
         # Add confidence interval
@@ -580,36 +763,55 @@ elif page == "🔮 Forecasting":
         st.subheader("📈 Model Performance Metrics")
         col1, col2, col3, col4 = st.columns(4)
         
-        metrics = {
-            'XGBoost': {'MAE': '11,234', 'RMSE': '14,567', 'R²': '0.91', 'MAPE': '4.2%'},
-            'Random Forest': {'MAE': '12,456', 'RMSE': '15,789', 'R²': '0.89', 'MAPE': '4.8%'},
-            'Hybrid (Prophet + XGBoost)': {'MAE': '9,876', 'RMSE': '12,345', 'R²': '0.94', 'MAPE': '3.5%'}
+        backtest_methods = {
+            'XGBoost': 'xgboost',
+            'Random Forest': 'random_forest',
+            'Hybrid (Prophet + XGBoost)': 'hybrid'
         }
         
-        selected_metrics = metrics[model_type]
+        # Product-level backtest when one exists, otherwise the catalog-wide roll-up
+        backtest = load_backtest(forecast_model) or load_backtest()
+        selected_metrics = None
+        if backtest is not None:
+            horizons = backtest['methods'].get(backtest_methods[model_type], [])
+            selected_metrics = summarize_backtest(horizons, forecast_period)
+        
+        if selected_metrics is not None:
+            scope = forecast_model if backtest['model'] else "all models"
+            st.caption(f"Rolling-origin backtest ({scope}), months 1-{forecast_period} ahead")
+            deltas = {}
+        else:
+            st.caption("⚠️ No backtest results yet - run `python backend/backtesting.py`; showing reference values")
+            metrics = {
+                'XGBoost': {'MAE': '11,234', 'RMSE': '14,567', 'MAPE': '4.2%', 'Windows': '-'},
+                'Random Forest': {'MAE': '12,456', 'RMSE': '15,789', 'MAPE': '4.8%', 'Windows': '-'},
+                'Hybrid (Prophet + XGBoost)': {'MAE': '9,876', 'RMSE': '12,345', 'MAPE': '3.5%', 'Windows': '-'}
+            }
+            selected_metrics = metrics[model_type]
+            deltas = {'MAE': "↓ 5.2%", 'RMSE': "↓ 4.8%", 'MAPE': "↓ 0.5%"}
         
         with col1:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.metric("MAE", selected_metrics['MAE'], "↓ 5.2%")
+            st.metric("MAE", selected_metrics['MAE'], deltas.get('MAE'))
             st.caption("Mean Absolute Error")
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col2:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.metric("RMSE", selected_metrics['RMSE'], "↓ 4.8%")
+            st.metric("RMSE", selected_metrics['RMSE'], deltas.get('RMSE'))
             st.caption("Root Mean Square Error")
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col3:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.metric("R² Score", selected_metrics['R²'], "↑ 0.03")
-            st.caption("Coefficient of Determination")
+            st.metric("MAPE", selected_metrics['MAPE'], deltas.get('MAPE'))
+            st.caption("Mean Absolute % Error")
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col4:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.metric("MAPE", selected_metrics['MAPE'], "↓ 0.5%")
-            st.caption("Mean Absolute % Error")
+            st.metric("Forecasts Scored", selected_metrics['Windows'])
+            st.caption("Backtest (window, month) pairs")
             st.markdown('</div>', unsafe_allow_html=True)
 
 # Feature Impact Page
@@ -1067,132 +1269,22 @@ A 10% price reduction typically results in:
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Generate intelligent response based on keywords
-        with st.spinner("🤔 Analyzing your question..."):
-            time.sleep(1)
-            
-            # Intelligent response system
-            response = generate_ai_response(prompt)
-            
-            with st.chat_message("assistant"):
-                st.markdown(response)
-            
-            # Add assistant message
-            st.session_state.chat_history.append({"role": "assistant", "content": response})
-
-def generate_ai_response(query):
-    """Generate intelligent responses based on query keywords"""
-    query_lower = query.lower()
-    
-    if "trend" in query_lower or "market" in query_lower:
-        return """📈 **Market Trends Analysis:**
-
-**Current Trends (2024):**
-1. **Premiumization**: Average selling price up 12% to $420
-2. **AI Integration**: On-device AI becoming key differentiator
-3. **Foldables**: 65% growth, expected to reach 30M units
-4. **Sustainability**: 40% consumers consider eco-friendly features
-5. **5G Adoption**: 85% of new launches include 5G
-
-**Regional Insights:**
-- **Asia Pacific**: +8% growth, driven by India and Southeast Asia
-- **North America**: +3% growth, premium segment focus
-- **Europe**: Stable, replacement-driven market
-- **Latin America**: +12% growth, budget segment focus"""
-    
-    elif "competitor" in query_lower or "competition" in query_lower:
-        return """🎯 **Competitive Landscape Analysis:**
-
-**Market Share Q2 2024:**
-- Samsung: 22.5% (↑1.2%)
-- Apple: 20.8% (↑2.1%)
-- Xiaomi: 14.2% (↓0.5%)
-- Oppo: 9.5% (↓0.3%)
-- Vivo: 8.7% (↑0.2%)
-- Others: 24.3%
-
-**Key Competitive Moves:**
-- Apple: Aggressive pricing in India, manufacturing diversification
-- Samsung: AI features in mid-range, foldable expansion
-- Xiaomi: Premium push with Leica partnership
-- Google: Vertical integration with Tensor chips
-
-**Threats:**
-- Refurbished market growing 15% annually
-- Chinese brands entering new markets
-- Regulatory pressures in Europe"""
-    
-    elif "profit" in query_lower or "margin" in query_lower:
-        return """💰 **Profitability Analysis:**
-
-**Average Margins by Segment:**
-- Premium ($800+): 45-50% margin
-- Mid-range ($400-800): 25-30% margin
-- Budget (<$400): 10-15% margin
-
-**Cost Breakdown (Mid-range):**
-- Components: 55% (Display, SoC, Camera, Battery)
-- R&D: 12%
-- Marketing: 15%
-- Distribution: 8%
-- Profit: 10%
-
-**Optimization Strategies:**
-1. Reduce SKU count by 20% to save costs
-2. Increase direct-to-consumer sales
-3. Bundle services (cloud, warranty) for higher margins
-4. Use common components across models"""
-    
-    elif "feature" in query_lower or "spec" in query_lower:
-        return """🔧 **Feature Impact Analysis:**
-
-**Most Valued Features by Segment:**
-
-**Premium ($800+):**
-1. Camera quality (40%)
-2. Build quality/design (25%)
-3. Display technology (20%)
-4. Brand prestige (15%)
-
-**Mid-range ($400-800):**
-1. Value for money (35%)
-2. Camera (25%)
-3. Battery life (20%)
-4. Performance (20%)
-
-**Budget (<$400):**
-1. Price (40%)
-2. Battery life (30%)
-3. Display size (15%)
-4. RAM/Storage (15%)
-
-**Emerging Features:**
-- AI capabilities (+15% interest YoY)
-- Satellite connectivity (+25%)
-- Repairability (+30%)"""
-    
-    else:
-        return """📊 **General Business Insights:**
-
-Based on your query, here are key insights from the data:
-
-**Sales Performance:**
-- Total market: 1.2B units annually
-- Growth rate: 3.5% YoY
-- ASP: $402 (↑4% YoY)
-
-**Top Recommendations:**
-1. Focus on camera innovation for premium segment
-2. Optimize pricing for mid-range ($400-600 sweet spot)
-3. Expand in emerging markets (India, LATAM, Africa)
-4. Invest in AI features for differentiation
-5. Develop sustainable practices for brand value
-
-**Would you like specific analysis on:**
-- Feature importance by segment
-- Regional market trends
-- Competitive benchmarking
-- Pricing optimization strategies"""
+        # Render tokens as the backend streams them
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
+            response = ""
+            try:
+                for token in stream_chat(prompt):
+                    response += token
+                    placeholder.markdown(response + "▌")
+            except Exception:
+                # Fall back to the built-in answers when the backend is unavailable
+                if not response:
+                    response = generate_ai_response(prompt)
+            placeholder.markdown(response)
+        
+        # Add assistant message
+        st.session_state.chat_history.append({"role": "assistant", "content": response})
 
 # Footer
 st.markdown("---")